@@ -1,34 +1,163 @@
+import sys
 import tempfile
 import shutil
+import threading
+import time
+import concurrent.futures
+import ctypes
+import errno
+import hashlib
+import os
 import fsspec
 import requests
 import json
+import posixpath
 from pathlib import Path
-from urllib.parse import urlparse
+from urllib.parse import quote, urlparse
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
 
-def load_github_token():
+CONFIG_PATH = Path("data/fetcher/config.json")
+
+# Number of concurrent requests when none is set in the config.
+DEFAULT_WORKERS = 8
+
+# REST and GraphQL endpoints. Both can be overridden in the config ("api_url",
+# "graphql_url"), e.g. to point the fetcher at GitHub Enterprise or a local stand-in.
+API_URL = "https://api.github.com"
+GRAPHQL_URL = "https://api.github.com/graphql"
+
+# File contents are downloaded from here, pinned to the resolved commit hash.
+RAW_URL = "https://raw.githubusercontent.com/{owner}/{repo}/{ref}/{path}"
+
+# For git-lfs files the raw URL serves the pointer file, which starts with this line.
+# The real file is fetched through the contents API's download_url instead.
+LFS_POINTER_PREFIX = b"version https://git-lfs.github.com/spec/v1"
+# git-lfs pointer files are always smaller than this.
+LFS_POINTER_MAX_SIZE = 1024
+
+# Bumped when the blob store changes in a way that invalidates cached trees. Version 2
+# stores the real contents of git-lfs files instead of their pointers.
+STORE_VERSION = 2
+
+# Seconds an unreferenced blob, a partial download or a tree without a manifest is
+# kept, as it may belong to another build that is still running.
+GC_GRACE_PERIOD = 24 * 3600
+REQUEST_TIMEOUT = 60
+
+# Paths resolved per GraphQL query. Each one is a single aliased history lookup.
+GRAPHQL_BATCH_SIZE = 100
+
+# Seconds a cached commit hash is trusted before it is revalidated upstream.
+# Overridden by "cache_ttl" in the config, and per source by "ttl" in _fetch.json.
+DEFAULT_CACHE_TTL = 3600
+
+# Disk budget of the file cache's blob store, in megabytes ("cache_budget_mb" in
+# the config). Least recently used trees are removed once it is exceeded.
+DEFAULT_CACHE_BUDGET_MB = 1024
+
+# How fetched files are placed into the pack ("materialize" in the config), and the
+# methods each mode tries in order. Reflinks are copy-on-write clones, so they are as
+# safe as copies. Hardlinks share the file with the cache: only use them if no later
+# filter edits fetched files in place.
+MATERIALIZE_METHODS = {
+    "reflink": ("reflink", "copy"),
+    "hardlink": ("hardlink", "copy"),
+    "copy": ("copy",),
+}
+DEFAULT_MATERIALIZE = "reflink"
+
+# Linux ioctl that makes a file a reflink of another (FICLONE in linux/fs.h).
+FICLONE = 0x40049409
+
+
+def load_config():
     """
-    Load the GitHub token from data/fetcher/config.json. Returns None if not found or invalid.
+    Load data/fetcher/config.json. Returns an empty dict if it is missing or invalid.
     """
-    config_path = Path("data/fetcher/config.json")
-    if not config_path.exists():
+    if not CONFIG_PATH.exists():
         print("Warning: GitHub token config not found at data/fetcher/config.json. API requests may be rate-limited.")
-        return None
+        return {}
     try:
-        with config_path.open("r", encoding="utf-8") as f:
-            config = json.load(f)
-        token = config.get("github_token")
-        if not token:
-            print("Warning: 'github_token' not found in config file. API requests may be rate-limited.")
-        return token
+        with CONFIG_PATH.open("r", encoding="utf-8") as f:
+            return json.load(f)
     except Exception as e:
         print(f"Error reading GitHub token config: {e}")
-        return None
+        return {}
 
-github_token = load_github_token()
+
+def load_github_token(config):
+    """
+    Return the GitHub token from the loaded config, or None if it is not set.
+    """
+    token = config.get("github_token")
+    if not token and CONFIG_PATH.exists():
+        print("Warning: 'github_token' not found in config file. API requests may be rate-limited.")
+    return token
+
+config = load_config()
+github_token = load_github_token(config)
+workers = max(1, int(config.get("workers", DEFAULT_WORKERS)))
+api_endpoint = config.get("api_url", API_URL).rstrip("/")
+graphql_endpoint = config.get("graphql_url", GRAPHQL_URL)
+cache_ttl = float(config.get("cache_ttl", DEFAULT_CACHE_TTL))
+cache_budget = float(config.get("cache_budget_mb", DEFAULT_CACHE_BUDGET_MB)) * 1024 * 1024
+materialize_mode = config.get("materialize", DEFAULT_MATERIALIZE)
+if materialize_mode not in MATERIALIZE_METHODS:
+    print(f"Warning: unknown materialize mode '{materialize_mode}', using '{DEFAULT_MATERIALIZE}'.")
+    materialize_mode = DEFAULT_MATERIALIZE
 folders = ["data", "RP", "BP"]
 
+# One HTTP session (and so one keep-alive connection pool) for every request the
+# fetcher makes, and one GitHub filesystem per (owner, repo, branch) so directory
+# listings of the same repository are shared between fetch entries. Listings are
+# cached by git tree SHA (as futures, so each tree is requested once even when
+# sources are listed concurrently): trees are content-addressed, so a listing holds
+# for every commit and source that contains the same tree.
+_session = None
+_session_lock = threading.Lock()
+_filesystems = {}
+_filesystems_lock = threading.Lock()
+_trees = {}
+_trees_lock = threading.Lock()
+
+# Materialize methods that failed once, e.g. because the cache and the pack are on
+# different filesystems. They are not tried again for the rest of the run.
+_unsupported_methods = set()
+
+
+def get_session():
+    """
+    Return the shared requests session, creating it on first use.
+    Its connection pool holds as many connections as there are workers.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+            if github_token:
+                _session.headers["Authorization"] = f"token {github_token}"
+        return _session
+
+
+def get_github_filesystem(owner, repo, branch):
+    """
+    Return the fsspec GitHub filesystem for a repository branch, creating it on first use.
+    """
+    key = (owner, repo, branch)
+    with _filesystems_lock:
+        fs = _filesystems.get(key)
+        if fs is None:
+            auth = {"username": owner, "token": github_token} if github_token else {}
+            fs = _filesystems[key] = fsspec.filesystem("github", org=owner, repo=repo, sha=branch, **auth)
+        return fs
+
 
 def get_top_level_folder(path: str) -> str:
     """
@@ -43,33 +172,133 @@ def get_top_level_folder(path: str) -> str:
 
 def copy_from_cache_to_target(cache_dir: Path, target_dir: Path):
     """
-    Copy all files and folders from the cache directory to the target directory, skipping the _downloaded marker.
+    Make the target directory an exact copy of the cache directory.
     Args:
         cache_dir (Path): Path to the cache directory containing downloaded files.
         target_dir (Path): Directory to copy files/folders into.
     """
-    if target_dir.exists():
-        shutil.rmtree(target_dir)
-    target_dir.mkdir(parents=True, exist_ok=True)
-    for item in cache_dir.iterdir():
-        if item.name == "_downloaded":
+    copy_to_destination(cache_dir, target_dir)
+
+
+def reflink_file(src: Path, dst: Path):
+    """
+    Create dst as a copy-on-write clone of src, sharing its data blocks.
+    Supported on Linux (Btrfs, XFS, bcachefs...) and macOS (APFS).
+    Raises:
+        OSError: If the platform or filesystem does not support reflinks.
+    """
+    if sys.platform == "darwin":
+        libc = ctypes.CDLL(None, use_errno=True)
+        if libc.clonefile(os.fsencode(src), os.fsencode(dst), 0) != 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error), str(dst))
+        return
+    if fcntl is None or not sys.platform.startswith("linux"):
+        raise OSError(errno.EOPNOTSUPP, "Reflinks are not supported on this platform.")
+    with open(src, "rb") as src_file, open(dst, "wb") as dst_file:
+        try:
+            fcntl.ioctl(dst_file.fileno(), FICLONE, src_file.fileno())
+        except OSError:
+            dst_file.close()
+            dst.unlink()
+            raise
+
+
+def place_file(src: Path, dst: Path, mode: str) -> str:
+    """
+    Put a copy of src at dst with the first method of the mode that works.
+    Args:
+        src (Path): File to copy.
+        dst (Path): Where to put it. Must not exist.
+        mode (str): A MATERIALIZE_METHODS key.
+    Returns:
+        str: The method used ("reflink", "hardlink" or "copy").
+    """
+    for method in MATERIALIZE_METHODS[mode]:
+        if method in _unsupported_methods:
             continue
-        dest = target_dir / item.name
-        if item.is_dir():
-            shutil.copytree(item, dest)
-        else:
-            shutil.copy2(item, dest)
-    print(f"Copied all items to {target_dir}")
+        try:
+            if method == "hardlink":
+                os.link(src, dst)
+            elif method == "reflink":
+                reflink_file(src, dst)
+                shutil.copystat(src, dst)
+            else:
+                shutil.copy2(src, dst)
+            return method
+        except OSError:
+            if method == "copy":
+                raise
+            _unsupported_methods.add(method)
+    raise OSError(f"No materialize method available for {dst}.")
 
 
-def get_latest_commit_hash(github_url: str, github_token: str) -> str:
+def _is_unchanged(src_stat, dst_stat, mode: str) -> bool:
+    """
+    Tell whether a destination file already matches its source, from their stat results.
+    Copies and reflinks keep the source's size and modification time, hardlinks are
+    the same file. Outside hardlink mode, a hardlink to the cache counts as changed,
+    so switching modes takes effect.
+    """
+    if (src_stat.st_dev, src_stat.st_ino) == (dst_stat.st_dev, dst_stat.st_ino):
+        return mode == "hardlink"
+    return src_stat.st_size == dst_stat.st_size and src_stat.st_mtime_ns == dst_stat.st_mtime_ns
+
+
+def _remove(path: Path):
+    if path.is_dir() and not path.is_symlink():
+        shutil.rmtree(path)
+    else:
+        path.unlink()
+
+
+def sync_tree(src_dir: Path, dst_dir: Path, mode: str, counts: dict):
+    """
+    Make dst_dir match src_dir, touching only what differs (like rsync --delete).
+    Files already matching their source are left alone, anything in dst_dir that
+    src_dir does not have is removed.
+    Args:
+        src_dir (Path): Directory to copy from.
+        dst_dir (Path): Directory to update.
+        mode (str): A MATERIALIZE_METHODS key.
+        counts (dict): Updated in place: files "placed", "unchanged", and "removed"
+            entries, plus one count per method used.
+    """
+    if dst_dir.is_symlink() or (dst_dir.exists() and not dst_dir.is_dir()):
+        dst_dir.unlink()
+    dst_dir.mkdir(parents=True, exist_ok=True)
+    existing = {entry.name: entry for entry in os.scandir(dst_dir)}
+    for entry in os.scandir(src_dir):
+        dest = dst_dir / entry.name
+        current = existing.pop(entry.name, None)
+        if entry.is_dir():
+            sync_tree(Path(entry.path), dest, mode, counts)
+            continue
+        if current is not None:
+            if not current.is_symlink() and current.is_file() and _is_unchanged(entry.stat(), current.stat(), mode):
+                counts["unchanged"] += 1
+                continue
+            _remove(dest)
+        method = place_file(Path(entry.path), dest, mode)
+        counts["placed"] += 1
+        counts[method] = counts.get(method, 0) + 1
+    for name in existing:
+        _remove(dst_dir / name)
+        counts["removed"] += 1
+
+
+def get_latest_commit_hash(github_url: str, github_token: str, etag: str = None) -> tuple:
     """
     Given a GitHub file or folder URL and a GitHub token, return the latest commit hash that touched that file or folder.
     Args:
         github_url (str): The GitHub file or folder URL.
         github_token (str): The GitHub personal access token.
+        etag (str): ETag of an earlier response. If given, the request is conditional
+            and an unchanged result costs a 304 (which GitHub does not count against
+            the rate limit).
     Returns:
-        str: The latest commit hash for the specified file or folder.
+        tuple: (commit hash, ETag of the response). The hash is None if etag was
+        given and the latest commit has not changed.
     Raises:
         ValueError: If no commits are found for the specified path.
     """
@@ -77,10 +306,14 @@ def get_latest_commit_hash(github_url: str, github_token: str) -> str:
     owner, repo, branch, path = parse_github_url(github_url)
 
     # Use the GitHub API to get the latest commit for the path
-    api_url = f"https://api.github.com/repos/{owner}/{repo}/commits"
+    api_url = f"{api_endpoint}/repos/{owner}/{repo}/commits"
     params = {"sha": branch, "path": path, "per_page": 1}
     headers = {"Authorization": f"token {github_token}"} if github_token else {}
-    resp = requests.get(api_url, params=params, headers=headers)
+    if etag:
+        headers["If-None-Match"] = etag
+    resp = get_session().get(api_url, params=params, headers=headers, timeout=REQUEST_TIMEOUT)
+    if resp.status_code == 304:
+        return None, etag
     if resp.status_code == 404:
         raise ValueError("Repository or path not found (404). Check the URL.")
     if resp.status_code == 403:
@@ -93,7 +326,78 @@ def get_latest_commit_hash(github_url: str, github_token: str) -> str:
     data = resp.json()
     if not data:
         raise ValueError("No commits found for the specified path.")
-    return data[0]["sha"]
+    return data[0]["sha"], resp.headers.get("ETag")
+
+
+def _history_query(owner, repo, refs):
+    """
+    Build a GraphQL query for the latest commit of several paths in one repository.
+    Args:
+        refs (dict): Branch -> list of paths. Every branch becomes an aliased
+            object(expression:) lookup ('b0', 'b1', ...) and every path an aliased
+            history(first: 1) inside it ('p0', 'p1', ...).
+    Returns:
+        str: The query.
+    """
+    # JSON string literals are valid GraphQL string literals.
+    branches = []
+    for b, (branch, paths) in enumerate(refs.items()):
+        histories = " ".join(
+            f"p{p}: history(first: 1{f', path: {json.dumps(path)}' if path else ''}) {{ nodes {{ oid }} }}"
+            for p, path in enumerate(paths)
+        )
+        branches.append(f"b{b}: object(expression: {json.dumps(branch)}) {{ ... on Commit {{ {histories} }} }}")
+    return f"query {{ repository(owner: {json.dumps(owner)}, name: {json.dumps(repo)}) {{ {' '.join(branches)} }} }}"
+
+
+def get_latest_commit_hashes(owner, repo, keys, github_token):
+    """
+    Resolve the latest commit hash of many paths in one repository with batched GraphQL queries.
+    Args:
+        owner (str): GitHub repository owner.
+        repo (str): Repository name.
+        keys (list): (branch, path) pairs to resolve.
+        github_token (str): The GitHub personal access token. GraphQL requires one.
+    Returns:
+        dict: (branch, path) -> commit hash, or the exception to raise for that pair.
+    Raises:
+        PermissionError: If the token is rejected.
+    """
+    results = {}
+    for start in range(0, len(keys), GRAPHQL_BATCH_SIZE):
+        batch = keys[start : start + GRAPHQL_BATCH_SIZE]
+        refs = {}
+        for branch, path in batch:
+            refs.setdefault(branch, []).append(path)
+
+        resp = get_session().post(
+            graphql_endpoint,
+            json={"query": _history_query(owner, repo, refs)},
+            headers={"Authorization": f"bearer {github_token}"},
+            timeout=REQUEST_TIMEOUT,
+        )
+        if resp.status_code in (401, 403):
+            raise PermissionError(f"Access denied ({resp.status_code}). Your GitHub token may not have access to this repository.")
+        resp.raise_for_status()
+        data = resp.json()
+        repository = (data.get("data") or {}).get("repository")
+        if repository is None:
+            messages = "; ".join(error.get("message", "") for error in data.get("errors", []))
+            error = ValueError(f"Repository not found or not accessible: {messages or 'no data returned'}")
+            results.update((key, error) for key in batch)
+            continue
+
+        for b, (branch, paths) in enumerate(refs.items()):
+            commit = repository.get(f"b{b}")
+            for p, path in enumerate(paths):
+                if commit is None:
+                    results[(branch, path)] = ValueError(f"Branch '{branch}' not found.")
+                    continue
+                nodes = (commit.get(f"p{p}") or {}).get("nodes") or []
+                results[(branch, path)] = (
+                    nodes[0]["oid"] if nodes else ValueError("No commits found for the specified path.")
+                )
+    return results
 
 
 def parse_github_url(source_url):
@@ -123,50 +427,262 @@ def parse_github_url(source_url):
     return m.groups()  # owner, repo, branch, path
 
 
-def download_from_github(owner, repo, branch, path, cache_dir, github_token):
+def list_github_tree(fs, commit_hash, path, tree_sha):
+    """
+    List one git tree of a repository, requesting it only once per run.
+    Args:
+        fs (GithubFileSystem): Filesystem of the repository branch.
+        commit_hash (str): Commit the tree belongs to.
+        path (str): Path of the tree within the repository ('' for the root).
+        tree_sha (str): SHA of the tree, or the commit hash for the root tree.
+    Returns:
+        dict: Entry name -> (type, SHA), with type 'file' or 'directory'.
+    """
+    key = (fs.org, fs.repo, tree_sha)
+    # Sources are listed concurrently and usually share their top folders, so a
+    # tree another thread is already requesting is waited for, not requested again.
+    with _trees_lock:
+        listing = _trees.get(key)
+        requesting = listing is None
+        if requesting:
+            listing = _trees[key] = concurrent.futures.Future()
+    if requesting:
+        try:
+            # fsspec's own listing cache is keyed by path at the branch head; passing
+            # the commit makes it request exactly this tree instead.
+            entries = fs.ls(path, detail=True, sha=commit_hash, _sha=tree_sha)
+        except Exception as e:
+            with _trees_lock:
+                del _trees[key]
+            listing.set_exception(e)
+            raise
+        listing.set_result(
+            {posixpath.basename(entry["name"]): (entry["type"], entry["sha"]) for entry in entries}
+        )
+    return listing.result()
+
+
+def list_github_files(owner, repo, branch, commit_hash, path):
     """
-    Download a file or folder from a GitHub repository to a local cache directory using fsspec.
+    List the files under a path in a GitHub repository (or the file itself).
     Args:
         owner (str): GitHub repository owner.
         repo (str): Repository name.
-        branch (str): Branch name.
-        path (str): Path within the repository to download.
-        cache_dir (str): Local directory to store the downloaded files.
-        github_token (str): GitHub personal access token.
-    """
-    fs = fsspec.filesystem(
-        "github",
-        org=owner,
-        repo=repo,
-        username=owner,
-        token=github_token,
-        branch=branch,
-    )
-    github_path = path.rstrip("/")
-    fs.get(github_path, str(cache_dir), recursive=True)
+        branch (str): Branch the commit was resolved from.
+        commit_hash (str): Commit to list the path at.
+        path (str): Path within the repository.
+    Returns:
+        list: (remote path, local path, blob SHA) tuples. Local paths are relative to
+        the tree directory and keep the last segment of the source path, e.g.
+        'scripts/main.js' for 'packs/scripts'.
+    Raises:
+        FileNotFoundError: If the path does not exist at the commit.
+    """
+    fs = get_github_filesystem(owner, repo, branch)
+    github_path = path.strip("/")
+    name, kind, sha = "", "directory", commit_hash
+    for part in github_path.split("/") if github_path else []:
+        entry = list_github_tree(fs, commit_hash, name, sha).get(part) if kind == "directory" else None
+        if entry is None:
+            raise FileNotFoundError(f"Nothing found at '{github_path}' at '{commit_hash}'.")
+        name = posixpath.join(name, part)
+        kind, sha = entry
+
+    files = {}
+    trees = [(name, sha)] if kind == "directory" else []
+    if kind == "file":
+        files[name] = sha
+    while trees:
+        tree_path, tree_sha = trees.pop()
+        for child, (child_kind, child_sha) in list_github_tree(fs, commit_hash, tree_path, tree_sha).items():
+            child_path = posixpath.join(tree_path, child)
+            if child_kind == "directory":
+                trees.append((child_path, child_sha))
+            else:
+                files[child_path] = child_sha
+    if not files:
+        raise FileNotFoundError(f"Nothing found at '{github_path}' at '{commit_hash}'.")
+    parent = posixpath.dirname(github_path)
+    return [
+        (name, posixpath.relpath(name, parent) if parent else name, files[name])
+        for name in sorted(files)
+    ]
+
+
+def git_blob_sha(data: bytes) -> str:
+    """
+    Return the git blob SHA of some file contents, as listed in GitHub trees.
+    """
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+def get_blob_path(file_cache_dir: Path, blob_sha: str) -> Path:
+    """
+    Return where the blob store keeps the file with the given git blob SHA.
+    """
+    return file_cache_dir / "blobs" / blob_sha[:2] / blob_sha
+
+
+def get_lfs_record_path(blob_path: Path) -> Path:
+    """
+    Return the file recording that a blob holds the real contents of a git-lfs file.
+    Those contents do not hash to the blob SHA (the pointer does), so the record
+    holds the pointer instead.
+    """
+    return blob_path.with_name(f"{blob_path.name}.lfs")
+
+
+def is_blob_stored(blob_path: Path) -> bool:
+    """
+    Tell whether the blob store has a usable copy of a blob.
+    A small blob without an LFS record that is itself an LFS pointer was stored by
+    an older version, which kept pointers instead of contents, and is downloaded again.
+    """
+    try:
+        size = blob_path.stat().st_size
+    except FileNotFoundError:
+        return False
+    if size >= LFS_POINTER_MAX_SIZE or get_lfs_record_path(blob_path).exists():
+        return True
+    with blob_path.open("rb") as f:
+        return f.read(len(LFS_POINTER_PREFIX)) != LFS_POINTER_PREFIX
+
+
+def get_tree_id(commit_hash, owner, repo, path):
+    """
+    Return the name the file cache stores a source's tree under.
+    The commit hash alone is not enough: different paths, or different repositories,
+    can have the same latest commit.
+    """
+    source = hashlib.sha1(f"{owner}/{repo}/{path.strip('/')}".encode("utf-8")).hexdigest()[:12]
+    return f"{commit_hash}-{source}"
+
+
+def parse_lfs_pointer(data: bytes):
+    """
+    Parse a git-lfs pointer file.
+    Returns:
+        tuple: (sha256 hex digest, size in bytes) of the real file, or None if data
+        is not an LFS pointer.
+    Raises:
+        ValueError: If data starts like a pointer but has no sha256 oid or size.
+    """
+    if not data.startswith(LFS_POINTER_PREFIX):
+        return None
+    fields = dict(line.split(" ", 1) for line in data.decode("utf-8").splitlines() if " " in line)
+    oid = fields.get("oid", "")
+    if not oid.startswith("sha256:") or not fields.get("size", "").isdigit():
+        raise ValueError("Malformed git-lfs pointer.")
+    return oid[len("sha256:"):], int(fields["size"])
 
 
-def copy_to_destination(src_dir, dst_dir):
+def download_lfs_object(owner, repo, ref, remote_path, oid, size) -> bytes:
     """
-    Copy all files and folders from the source directory to the destination directory, skipping the _downloaded marker.
+    Download the real contents of a git-lfs file through the contents API's download_url.
+    Args:
+        owner (str): GitHub repository owner.
+        repo (str): Repository name.
+        ref (str): Commit hash (or branch) the pointer was read at.
+        remote_path (str): Path of the file within the repository.
+        oid (str): sha256 of the real file, from the pointer.
+        size (int): Size of the real file, from the pointer.
+    Returns:
+        bytes: The file contents.
+    Raises:
+        ValueError: If the contents do not match the pointer's oid and size.
+    """
+    api_url = f"{api_endpoint}/repos/{owner}/{repo}/contents/{quote(remote_path)}"
+    headers = {"Authorization": f"token {github_token}"} if github_token else {}
+    resp = get_session().get(api_url, params={"ref": ref}, headers=headers, timeout=REQUEST_TIMEOUT)
+    resp.raise_for_status()
+    download_url = resp.json().get("download_url")
+    if not download_url:
+        raise ValueError(f"No download URL for git-lfs file '{remote_path}'.")
+    resp = get_session().get(download_url, timeout=REQUEST_TIMEOUT)
+    resp.raise_for_status()
+    if len(resp.content) != size or hashlib.sha256(resp.content).hexdigest() != oid:
+        raise ValueError(f"Contents of git-lfs file '{remote_path}' do not match its pointer.")
+    return resp.content
+
+
+def download_blob(owner, repo, ref, remote_path, blob_sha, blob_path):
+    """
+    Download a single file from a GitHub repository into the blob store.
+    git-lfs files are stored with their real contents, not the pointer, and the
+    pointer is kept next to them as their LFS record (see get_lfs_record_path).
+    Args:
+        owner (str): GitHub repository owner.
+        repo (str): Repository name.
+        ref (str): Commit hash (or branch) to download the file at.
+        remote_path (str): Path of the file within the repository.
+        blob_sha (str): Git blob SHA the listing gave for the file.
+        blob_path (Path): Where to store the blob.
+    Raises:
+        ValueError: If the downloaded contents do not match blob_sha, or an LFS
+            file does not match its pointer.
+    """
+    url = RAW_URL.format(owner=owner, repo=repo, ref=ref, path=quote(remote_path))
+    resp = get_session().get(url, timeout=REQUEST_TIMEOUT)
+    resp.raise_for_status()
+    data = resp.content
+    if git_blob_sha(data) != blob_sha:
+        raise ValueError(f"Contents of '{remote_path}' do not match blob {blob_sha}.")
+    # For an LFS file the git blob is the pointer, so the check above cannot tell
+    # the two apart; the real contents are checked against the pointer instead.
+    pointer = parse_lfs_pointer(data)
+    if pointer is not None:
+        data = download_lfs_object(owner, repo, ref, remote_path, *pointer)
+    # Write under a temporary name first, so the store never holds a partial blob.
+    # The name is unique across processes, as several builds may share the store.
+    blob_path.parent.mkdir(parents=True, exist_ok=True)
+    if pointer is not None:
+        get_lfs_record_path(blob_path).write_bytes(resp.content)
+    with tempfile.NamedTemporaryFile(dir=blob_path.parent, prefix=f"{blob_sha}.", suffix=".part", delete=False) as f:
+        f.write(data)
+    os.replace(f.name, blob_path)
+
+
+def materialize_tree(files, tree_dir, file_cache_dir):
+    """
+    Build a source's tree directory out of hardlinks into the blob store.
+    Files are copied instead where the filesystem does not support hardlinks.
+    Args:
+        files (list): (remote path, local path, blob SHA) tuples from list_github_files.
+        tree_dir (Path): Directory to build the tree in. Anything already there is replaced.
+        file_cache_dir (Path): Root of the file cache.
+    """
+    if tree_dir.exists():
+        shutil.rmtree(tree_dir)
+    for _, local_path, blob_sha in files:
+        dest = tree_dir / local_path
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        blob_path = get_blob_path(file_cache_dir, blob_sha)
+        try:
+            os.link(blob_path, dest)
+        except OSError:
+            shutil.copyfile(blob_path, dest)
+
+
+def copy_to_destination(src_dir, dst_dir, mode=None):
+    """
+    Make the destination directory an exact copy of the source directory.
+    Only files that differ are written, so fetching an unchanged source again costs
+    metadata operations only. Files are placed as reflinks, hardlinks or copies
+    depending on the mode.
     Args:
         src_dir (str or Path): Path to the source directory containing files to copy.
         dst_dir (str or Path): Path to the destination directory.
+        mode (str): A MATERIALIZE_METHODS key. Defaults to the configured "materialize".
     """
     src_dir = Path(src_dir)
     dst_dir = Path(dst_dir)
-    if dst_dir.exists():
-        shutil.rmtree(dst_dir)
-    dst_dir.mkdir(parents=True, exist_ok=True)
-    for item in src_dir.iterdir():
-        if item.name == "_downloaded":
-            continue
-        dest = dst_dir / item.name
-        if item.is_dir():
-            shutil.copytree(item, dest)
-        else:
-            shutil.copy2(item, dest)
-    print(f"Copied all items to {dst_dir}")
+    counts = {"placed": 0, "unchanged": 0, "removed": 0}
+    sync_tree(src_dir, dst_dir, mode or materialize_mode, counts)
+    methods = ", ".join(f"{counts[method]} by {method}" for method in ("reflink", "hardlink", "copy") if method in counts)
+    print(
+        f"Copied all items to {dst_dir} ({counts['placed']} written{f' ({methods})' if methods else ''}, "
+        f"{counts['unchanged']} unchanged, {counts['removed']} removed)"
+    )
 
 
 def load_cache(cache_path):
@@ -175,15 +691,21 @@ def load_cache(cache_path):
     Args:
         cache_path (str): Path to the cache JSON file.
     Returns:
-        dict: The loaded cache dictionary.
+        dict: Source URL -> {"hash", "etag", "checked"}, where 'checked' is when the
+        hash was last confirmed upstream (seconds since the epoch). Entries written
+        by older versions (a bare hash) are loaded as never checked.
     """
     cache_path = Path(cache_path)
     if cache_path.exists():
         try:
             with cache_path.open("r", encoding="utf-8") as f:
-                return json.load(f)
+                cache = json.load(f)
         except Exception:
             return {}
+        return {
+            source_url: entry if isinstance(entry, dict) else {"hash": entry, "etag": None, "checked": 0}
+            for source_url, entry in cache.items()
+        }
     return {}
 
 
@@ -199,15 +721,16 @@ def save_cache(cache_path, cache):
         json.dump(cache, f, indent=2, ensure_ascii=False)
 
 
-def main():
-    cache_path = Path(tempfile.gettempdir()) / "regolith_fetcher_cache.json"
-    file_cache_dir = Path(tempfile.gettempdir()) / "regolith_fetcher_files"
-    file_cache_dir.mkdir(parents=True, exist_ok=True)
-    cache = load_cache(cache_path)
-
+def collect_fetch_entries():
+    """
+    Read every _fetch.json under the pack folders and remove it.
+    Returns:
+        list: (fetch file directory, source URL, target, ttl) tuples, in a stable order.
+        ttl is the entry's "ttl" in seconds, or the configured cache_ttl.
+    """
+    entries = []
     for folder in folders:
-        for fetch_file in Path(folder).rglob("_fetch.json"):
-            fetch_file = Path(fetch_file)
+        for fetch_file in sorted(Path(folder).rglob("_fetch.json")):
             with fetch_file.open("r", encoding="utf-8") as f:
                 fetch_data = json.load(f)
 
@@ -218,73 +741,353 @@ def main():
             except Exception as e:
                 print(f"Error removing fetch file {fetch_file}: {e}")
 
-            fetch_file_dir = fetch_file.parent
             for fetcher in fetch_data:
                 source_url = fetcher.get("source")
-                target = fetcher.get("target", "")
-                if not source_url:
-                    continue
+                if source_url:
+                    ttl = float(fetcher.get("ttl", cache_ttl))
+                    entries.append((fetch_file.parent, source_url, fetcher.get("target", ""), ttl))
+    return entries
 
-                # Get latest commit hash (from cache or GitHub)
-                latest_hash = cache.get(source_url)
-                if not latest_hash:
-                    try:
-                        latest_hash = get_latest_commit_hash(source_url, github_token)
-                        cache[source_url] = latest_hash
-                        print(f"Fetched and cached: {latest_hash}")
-                    except PermissionError as e:
-                        print(f"Warning: {e}\nSkipping fetch for {source_url}.")
-                        continue
-                    except Exception as e:
-                        print(f"Error fetching commit hash for {source_url}: {e}")
-                        continue
-                else:
-                    print(f"Cache hit: {latest_hash}")
-
-                # Prepare cache dir for this hash
-                hash_cache_dir = file_cache_dir / latest_hash
-                hash_cache_dir.mkdir(parents=True, exist_ok=True)
-
-                # Parse repo, branch, and path from the URL (always needed)
-                try:
-                    owner, repo, branch, path = parse_github_url(source_url)
-                except ValueError as e:
-                    print(e)
-                    continue
 
-                # Determine if we need to (re)download
-                cache_marker = hash_cache_dir / "_downloaded"
-                need_download = not cache_marker.exists()
-
-                if need_download:
-                    try:
-                        download_from_github(
-                            owner, repo, branch, path, hash_cache_dir, github_token
-                        )
-                        with cache_marker.open("w") as f:
-                            f.write("ok")
-                        print(f"Downloaded {source_url} to cache {hash_cache_dir}")
-                    except Exception as e:
-                        print(f"Error downloading {source_url}: {e}")
-                        continue
-                else:
-                    print(f"Using cached files for {source_url}")
-
-                # Handle target logic for copying
-                if not target or target.strip() == "":
-                    # No target specified: create a top-level folder named after the top folder in the path
-                    top_folder = get_top_level_folder(path)
-                    if not top_folder:
-                        print(f"No top-level folder found in path: {path}, skipping.")
-                        continue
-                    dst_folder = fetch_file_dir / top_folder
-                    copy_to_destination(hash_cache_dir, dst_folder)
-                else:
-                    # Target specified: copy all files/folders into the target path (relative to fetch_file_dir)
-                    target_path = (fetch_file_dir / target).resolve()
-                    copy_to_destination(hash_cache_dir, target_path)
+def resolve_commit_hashes(entries, cache, executor, refresh=False):
+    """
+    Return the latest commit hash of every source, revalidating stale cache entries concurrently.
+    A cached hash is used as is while it is younger than its TTL (the shortest "ttl"
+    of the entries using that source). Older ones, or all of them with refresh, are
+    revalidated: with a conditional REST request if the entry has an ETag, which costs
+    a 304 when nothing changed, otherwise like uncached sources. With a token those are
+    grouped by repository and resolved with one GraphQL query per repository (per
+    GRAPHQL_BATCH_SIZE paths). GraphQL needs a token, so without one each distinct
+    (repository, branch, path) costs one REST request, whose ETag is kept.
+    If a stale entry cannot be revalidated, its cached hash is used with a warning.
+    Results are stored in the cache in the order the sources appear, not the order the
+    requests finish, so the saved cache file is the same from run to run.
+    Args:
+        entries (list): Entries from collect_fetch_entries.
+        cache (dict): Cache from load_cache, updated in place.
+        executor (Executor): Pool to run the requests on.
+        refresh (bool): Revalidate every cached hash, whatever its age.
+    Returns:
+        dict: Source URL -> commit hash, for every source that could be resolved.
+    """
+    now = time.time()
+    ttls = {}
+    for _, source_url, _, ttl in entries:
+        ttls[source_url] = min(ttl, ttls.get(source_url, ttl))
+    sources = list(ttls)
+
+    def is_fresh(source_url):
+        entry = cache.get(source_url)
+        return entry is not None and not refresh and now - entry["checked"] < ttls[source_url]
+
+    # Tree and blob URLs of the same path, or paths with and without a trailing
+    # slash, resolve to the same commit.
+    keys = {}
+    errors = {}
+    for source_url in sources:
+        if is_fresh(source_url):
+            continue
+        try:
+            owner, repo, branch, path = parse_github_url(source_url)
+        except ValueError as e:
+            errors[source_url] = e
+            continue
+        keys[source_url] = (owner, repo, branch, path.strip("/"))
+
+    futures = {}
+    repos = {}
+    for source_url, key in keys.items():
+        etag = (cache.get(source_url) or {}).get("etag")
+        if etag or not github_token:
+            if (key, etag) not in futures:
+                futures[(key, etag)] = executor.submit(get_latest_commit_hash, source_url, github_token, etag)
+        else:
+            owner, repo, branch, path = key
+            repos.setdefault((owner, repo), {})[(branch, path)] = None
+    for (owner, repo), repo_keys in repos.items():
+        futures[(owner, repo)] = executor.submit(get_latest_commit_hashes, owner, repo, list(repo_keys), github_token)
+
+    hashes = {}
+    for source_url in sources:
+        entry = cache.get(source_url)
+        if is_fresh(source_url):
+            hashes[source_url] = entry["hash"]
+            print(f"Cache hit: {entry['hash']}")
+            continue
+        try:
+            if source_url in errors:
+                raise errors[source_url]
+            owner, repo, branch, path = key = keys[source_url]
+            etag = (entry or {}).get("etag")
+            if (key, etag) in futures:
+                latest_hash, etag = futures[(key, etag)].result()
+            else:
+                latest_hash = futures[(owner, repo)].result()[(branch, path)]
+                if isinstance(latest_hash, Exception):
+                    raise latest_hash
+        except Exception as e:
+            if entry is not None:
+                print(f"Warning: could not revalidate {source_url} ({e}). Using cached hash {entry['hash']}.")
+                hashes[source_url] = entry["hash"]
+            elif isinstance(e, PermissionError):
+                print(f"Warning: {e}\nSkipping fetch for {source_url}.")
+            else:
+                print(f"Error fetching commit hash for {source_url}: {e}")
+            continue
+
+        if latest_hash is None:
+            print(f"Not modified: {entry['hash']}")
+            latest_hash = entry["hash"]
+        elif entry is not None and entry["hash"] == latest_hash:
+            print(f"Revalidated: {latest_hash}")
+        else:
+            print(f"Fetched and cached: {latest_hash}")
+        cache[source_url] = {"hash": latest_hash, "etag": etag, "checked": now}
+        hashes[source_url] = latest_hash
+    return hashes
+
+
+def is_tree_stored(manifest_path: Path, tree_dir: Path) -> bool:
+    """
+    Tell whether a tree is complete and was written by the current STORE_VERSION.
+    """
+    if not tree_dir.exists():
+        return False
+    try:
+        with manifest_path.open("r", encoding="utf-8") as f:
+            return json.load(f).get("version") == STORE_VERSION
+    except (OSError, ValueError):
+        return False
+
+
+def download_missing(entries, hashes, file_cache_dir, executor):
+    """
+    Make sure the file cache has the tree of every source at its resolved commit.
+    The cache is content-addressed: files are stored once in blobs/ under their git
+    blob SHA, and each (commit, source) gets a manifest in manifests/ and a tree in
+    trees/ made of hardlinks to those blobs. A new commit only downloads the blobs the
+    store does not have yet, which is usually just the files that changed.
+    All sources are listed first and then all missing blobs go through the same
+    pool, so one large folder does not hold up the small ones behind it.
+    Args:
+        entries (list): Entries from collect_fetch_entries.
+        hashes (dict): Source URL -> commit hash, from resolve_commit_hashes.
+        file_cache_dir (Path): Root of the file cache.
+        executor (Executor): Pool to run the requests on.
+    Returns:
+        dict: Source URL -> tree directory, for every source that is ready to be copied.
+    """
+    trees = {}
+    downloads = {}
+    # Source URLs that name a tree another source already downloads, e.g. the same
+    # folder with and without a trailing slash.
+    same_tree = {}
+    pending = {}
+    for _, source_url, _, _ in entries:
+        latest_hash = hashes.get(source_url)
+        if not latest_hash or source_url in trees or source_url in downloads or source_url in same_tree:
+            continue
+        try:
+            owner, repo, branch, path = parse_github_url(source_url)
+        except ValueError as e:
+            print(e)
+            continue
+        tree_id = get_tree_id(latest_hash, owner, repo, path)
+        manifest_path = file_cache_dir / "manifests" / f"{tree_id}.json"
+        tree_dir = file_cache_dir / "trees" / tree_id
+        if is_tree_stored(manifest_path, tree_dir):
+            print(f"Using cached files for {source_url}")
+            # The manifest's modification time is the tree's last use, for collect_garbage.
+            manifest_path.touch()
+            trees[source_url] = tree_dir
+            continue
+        if tree_id in pending:
+            same_tree[source_url] = pending[tree_id]
+            continue
+        pending[tree_id] = source_url
+        downloads[source_url] = (owner, repo, branch, path, latest_hash, manifest_path, tree_dir)
+
+    # The listing is taken at the resolved commit, so it matches the blobs downloaded at it.
+    listings = {
+        source_url: executor.submit(list_github_files, owner, repo, branch, latest_hash, path)
+        for source_url, (owner, repo, branch, path, latest_hash, _, _) in downloads.items()
+    }
+    blob_futures = {}
+    files_by_source = {}
+    for source_url, (owner, repo, _, _, latest_hash, _, _) in downloads.items():
+        try:
+            files = listings[source_url].result()
+        except Exception as e:
+            print(f"Error downloading {source_url}: {e}")
+            continue
+        files_by_source[source_url] = files
+        for remote_path, _, blob_sha in files:
+            blob_path = get_blob_path(file_cache_dir, blob_sha)
+            if blob_sha not in blob_futures and not is_blob_stored(blob_path):
+                blob_futures[blob_sha] = executor.submit(
+                    download_blob, owner, repo, latest_hash, remote_path, blob_sha, blob_path
+                )
+
+    for source_url, files in files_by_source.items():
+        _, _, _, _, latest_hash, manifest_path, tree_dir = downloads[source_url]
+        missing = {blob_sha for _, _, blob_sha in files if blob_sha in blob_futures}
+        try:
+            for blob_sha in missing:
+                blob_futures[blob_sha].result()
+            materialize_tree(files, tree_dir, file_cache_dir)
+        except Exception as e:
+            print(f"Error downloading {source_url}: {e}")
+            continue
+        # The manifest is written last: a tree without one is incomplete.
+        manifest = {
+            "version": STORE_VERSION,
+            "source": source_url,
+            "commit": latest_hash,
+            "files": {local_path: blob_sha for _, local_path, blob_sha in files},
+        }
+        manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        with manifest_path.open("w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False)
+        trees[source_url] = tree_dir
+        print(f"Downloaded {source_url} to cache {tree_dir} ({len(missing)} of {len(files)} files were new)")
+    for source_url, other_url in same_tree.items():
+        if other_url in trees:
+            trees[source_url] = trees[other_url]
+    return trees
+
+
+def collect_garbage(file_cache_dir, in_use, budget):
+    """
+    Keep the blob store within its disk budget by removing least recently used trees.
+    Trees are removed oldest first, by the last time a build used them, together
+    with every blob no remaining manifest refers to. Trees used by this build are
+    never removed, even if they alone exceed the budget. Cache folders from older
+    versions of the filter (one full copy per commit) are always removed, and so are
+    blobs no manifest refers to, partial downloads and trees without a manifest once
+    they are older than GC_GRACE_PERIOD. Until then they may belong to another build
+    that is still downloading.
+    Args:
+        file_cache_dir (Path): Root of the file cache.
+        in_use (set): Tree directories used by this build.
+        budget (float): Disk budget of the blob store, in bytes.
+    """
+    for item in file_cache_dir.iterdir():
+        if item.name in ("blobs", "manifests", "trees"):
+            continue
+        if item.is_dir():
+            shutil.rmtree(item)
+        else:
+            item.unlink()
+
+    manifests = []
+    references = {}
+    for manifest_path in (file_cache_dir / "manifests").glob("*.json"):
+        try:
+            with manifest_path.open("r", encoding="utf-8") as f:
+                blob_shas = set(json.load(f)["files"].values())
+        except Exception:
+            blob_shas = set()
+        manifests.append((manifest_path.stat().st_mtime, manifest_path, blob_shas))
+        for blob_sha in blob_shas:
+            references[blob_sha] = references.get(blob_sha, 0) + 1
+
+    expired = time.time() - GC_GRACE_PERIOD
+    sizes = {}
+    for blob_path in (file_cache_dir / "blobs").glob("*/*"):
+        # LFS records (<sha>.lfs) go with their blob, partial downloads are <sha>.*.part.
+        blob_sha = blob_path.name.split(".")[0]
+        if blob_sha in references and blob_path.suffix != ".part":
+            if blob_path.name == blob_sha:
+                sizes[blob_sha] = blob_path.stat().st_size
+            continue
+        if blob_path.stat().st_mtime < expired:
+            blob_path.unlink()
+    total = sum(sizes.values())
+
+    for _, manifest_path, blob_shas in sorted(manifests, key=lambda manifest: manifest[0]):
+        if total <= budget:
+            break
+        tree_dir = file_cache_dir / "trees" / manifest_path.stem
+        if tree_dir in in_use:
+            continue
+        manifest_path.unlink()
+        if tree_dir.exists():
+            shutil.rmtree(tree_dir)
+        for blob_sha in blob_shas:
+            references[blob_sha] -= 1
+            if references[blob_sha] == 0 and blob_sha in sizes:
+                blob_path = get_blob_path(file_cache_dir, blob_sha)
+                blob_path.unlink()
+                get_lfs_record_path(blob_path).unlink(missing_ok=True)
+                total -= sizes.pop(blob_sha)
+        print(f"Removed least recently used cache tree {manifest_path.stem}")
+
+    # Trees whose manifest is missing were left by an interrupted download, unless
+    # another build is still writing them.
+    for tree_dir in (file_cache_dir / "trees").glob("*"):
+        manifest_path = file_cache_dir / "manifests" / f"{tree_dir.name}.json"
+        if not manifest_path.exists() and tree_dir.stat().st_mtime < expired:
+            shutil.rmtree(tree_dir)
+
+
+def main(refresh=False):
+    """
+    Fetch every _fetch.json entry. With refresh, every cached commit hash is
+    revalidated upstream regardless of its TTL.
+    """
+    cache_path = Path(tempfile.gettempdir()) / "regolith_fetcher_cache.json"
+    file_cache_dir = Path(tempfile.gettempdir()) / "regolith_fetcher_files"
+    file_cache_dir.mkdir(parents=True, exist_ok=True)
+    cache = load_cache(cache_path)
+
+    entries = collect_fetch_entries()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        hashes = resolve_commit_hashes(entries, cache, executor, refresh)
+        trees = download_missing(entries, hashes, file_cache_dir, executor)
+
+    # Copy in _fetch.json order, so entries sharing a target overwrite each other
+    # the same way on every run.
+    for fetch_file_dir, source_url, target, _ in entries:
+        tree_dir = trees.get(source_url)
+        if tree_dir is None:
+            continue
+        _, _, _, path = parse_github_url(source_url)
+
+        # Handle target logic for copying
+        if not target or target.strip() == "":
+            # No target specified: create a top-level folder named after the top folder in the path
+            top_folder = get_top_level_folder(path)
+            if not top_folder:
+                print(f"No top-level folder found in path: {path}, skipping.")
+                continue
+            dst_folder = fetch_file_dir / top_folder
+            copy_to_destination(tree_dir, dst_folder)
+        else:
+            # Target specified: copy all files/folders into the target path (relative to fetch_file_dir)
+            target_path = (fetch_file_dir / target).resolve()
+            copy_to_destination(tree_dir, target_path)
     save_cache(cache_path, cache)
+    collect_garbage(file_cache_dir, set(trees.values()), cache_budget)
+
+
+def parse_args(argv):
+    """
+    Parse the filter's arguments: Regolith's optional JSON settings object, then flags.
+    Both '--refresh' and {"refresh": true} revalidate every cached commit hash.
+    Returns:
+        dict: Keyword arguments for main.
+    """
+    settings = {}
+    if argv and argv[0].lstrip().startswith("{"):
+        settings = json.loads(argv[0])
+        argv = argv[1:]
+    for arg in argv:
+        if arg == "--refresh":
+            settings["refresh"] = True
+        else:
+            raise SystemExit(f"Error: unknown argument '{arg}'.")
+    return {"refresh": bool(settings.get("refresh", False))}
 
 
 if __name__ == "__main__":
-    main()
+    main(**parse_args(sys.argv[1:]))
@@ -0,0 +1,352 @@
+import hashlib
+import json
+import posixpath
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import fetcher
+
+# Run from test/packs, like the filter: python -m pytest ../../test.py
+
+LFS_CONTENT = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 4
+LFS_POINTER = (
+    "version https://git-lfs.github.com/spec/v1\n"
+    f"oid sha256:{hashlib.sha256(LFS_CONTENT).hexdigest()}\n"
+    f"size {len(LFS_CONTENT)}\n"
+).encode("utf-8")
+MEDIA_URL = "https://media.githubusercontent.com/media/owner/repo/abc123/textures/icon.png"
+
+
+class FakeResponse:
+    def __init__(self, content, status_code=200, headers=None):
+        self.content = content
+        self.status_code = status_code
+        self.headers = headers or {}
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise fetcher.requests.HTTPError(f"{self.status_code}")
+
+
+class FakeSession:
+    """Serves a git-lfs tracked file the way GitHub does."""
+
+    def __init__(self, media_content=LFS_CONTENT):
+        self.media_content = media_content
+        self.urls = []
+
+    def get(self, url, **kwargs):
+        self.urls.append(url)
+        if url.startswith("https://raw.githubusercontent.com/"):
+            return FakeResponse(LFS_POINTER)
+        if url.startswith(f"{fetcher.api_endpoint}/repos/owner/repo/contents/"):
+            assert kwargs["params"] == {"ref": "abc123"}
+            return FakeResponse(json.dumps({"download_url": MEDIA_URL}).encode("utf-8"))
+        if url == MEDIA_URL:
+            return FakeResponse(self.media_content)
+        return FakeResponse(b"", 404)
+
+
+def download(monkeypatch, tmp_path, session):
+    monkeypatch.setattr(fetcher, "get_session", lambda: session)
+    blob_path = tmp_path / "blob"
+    fetcher.download_blob(
+        "owner", "repo", "abc123", "textures/icon.png", fetcher.git_blob_sha(LFS_POINTER), blob_path
+    )
+    return blob_path
+
+
+def test_parse_lfs_pointer():
+    assert fetcher.parse_lfs_pointer(LFS_POINTER) == (
+        hashlib.sha256(LFS_CONTENT).hexdigest(),
+        len(LFS_CONTENT),
+    )
+    assert fetcher.parse_lfs_pointer(b"plain file") is None
+
+
+def test_download_blob_follows_lfs_pointer(monkeypatch, tmp_path):
+    session = FakeSession()
+    blob_path = download(monkeypatch, tmp_path, session)
+
+    assert blob_path.read_bytes() == LFS_CONTENT
+    assert session.urls[-1] == MEDIA_URL
+
+
+def test_download_blob_rejects_lfs_content_not_matching_pointer(monkeypatch, tmp_path):
+    with pytest.raises(ValueError):
+        download(monkeypatch, tmp_path, FakeSession(media_content=LFS_CONTENT[:-1] + b"x"))
+    assert not (tmp_path / "blob").exists()
+
+
+def test_lfs_blob_is_recorded(monkeypatch, tmp_path):
+    blob_path = download(monkeypatch, tmp_path, FakeSession())
+
+    assert fetcher.get_lfs_record_path(blob_path).read_bytes() == LFS_POINTER
+    assert fetcher.is_blob_stored(blob_path)
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["blob", "blob.lfs"]
+
+
+def test_stored_lfs_pointer_is_downloaded_again(tmp_path):
+    blob_path = tmp_path / "blob"
+    blob_path.write_bytes(LFS_POINTER)
+    assert not fetcher.is_blob_stored(blob_path)
+
+    blob_path.write_bytes(b"plain file")
+    assert fetcher.is_blob_stored(blob_path)
+
+
+def test_collect_garbage_keeps_recent_partial_work(tmp_path):
+    blob_dir = tmp_path / "blobs" / "ab"
+    blob_dir.mkdir(parents=True)
+    (tmp_path / "manifests").mkdir()
+    fresh = [blob_dir / "ab12", blob_dir / "ab34.x1y2.part", tmp_path / "trees" / "c1-tree"]
+    stale = [blob_dir / "ab56", blob_dir / "ab78.z3w4.part", tmp_path / "trees" / "c0-tree"]
+    for path in fresh + stale:
+        if path.parent.name == "trees":
+            path.mkdir(parents=True)
+        else:
+            path.write_bytes(b"data")
+    expired = fetcher.time.time() - fetcher.GC_GRACE_PERIOD - 60
+    for path in stale:
+        fetcher.os.utime(path, (expired, expired))
+
+    fetcher.collect_garbage(tmp_path, set(), fetcher.cache_budget)
+
+    assert all(path.exists() for path in fresh)
+    assert not any(path.exists() for path in stale)
+
+
+class FakeGithubFileSystem:
+    """Serves git trees like fsspec's GitHub filesystem, counting requests."""
+
+    TREES = {
+        "c1": {"packs": ("directory", "t-packs"), "other": ("directory", "t-other1")},
+        "c2": {"packs": ("directory", "t-packs"), "other": ("directory", "t-other2")},
+        "t-packs": {"scripts": ("directory", "t-scripts"), "icon.png": ("file", "b-icon")},
+        "t-scripts": {"main.js": ("file", "b-main")},
+        "t-other1": {"x.txt": ("file", "b-x1")},
+        "t-other2": {"x.txt": ("file", "b-x2")},
+    }
+
+    def __init__(self, org, repo, sha):
+        self.org, self.repo, self.root = org, repo, sha
+        self.requests = []
+
+    def ls(self, path, detail=False, sha=None, _sha=None):
+        tree_sha = _sha if path else sha
+        self.requests.append(tree_sha)
+        return [
+            {"name": posixpath.join(path, name), "type": kind, "sha": child_sha}
+            for name, (kind, child_sha) in self.TREES[tree_sha].items()
+        ]
+
+
+def test_list_github_files_shares_filesystem_and_trees_across_commits(monkeypatch):
+    filesystems = []
+
+    def filesystem(protocol, org, repo, sha, **kwargs):
+        filesystems.append(FakeGithubFileSystem(org, repo, sha))
+        return filesystems[-1]
+
+    monkeypatch.setattr(fetcher.fsspec, "filesystem", filesystem)
+    monkeypatch.setattr(fetcher, "_filesystems", {})
+    monkeypatch.setattr(fetcher, "_trees", {})
+
+    assert fetcher.list_github_files("o", "r", "main", "c1", "packs") == [
+        ("packs/icon.png", "packs/icon.png", "b-icon"),
+        ("packs/scripts/main.js", "packs/scripts/main.js", "b-main"),
+    ]
+    assert fetcher.list_github_files("o", "r", "main", "c2", "packs/scripts/") == [
+        ("packs/scripts/main.js", "scripts/main.js", "b-main"),
+    ]
+    assert fetcher.list_github_files("o", "r", "main", "c2", "other/x.txt") == [
+        ("other/x.txt", "x.txt", "b-x2"),
+    ]
+    with pytest.raises(FileNotFoundError):
+        fetcher.list_github_files("o", "r", "main", "c1", "packs/icon.png/nested")
+
+    assert len(filesystems) == 1 and filesystems[0].root == "main"
+    # t-packs and t-scripts are the same trees at both commits.
+    assert sorted(filesystems[0].requests) == ["c1", "c2", "t-other2", "t-packs", "t-scripts"]
+
+
+class FakeGraphQLSession:
+    """Answers batched history queries with '<branch>:<path>' as each commit hash."""
+
+    def __init__(self):
+        self.queries = []
+
+    def get(self, url, **kwargs):
+        raise AssertionError(f"unexpected REST request to {url}")
+
+    def post(self, url, **kwargs):
+        assert url == fetcher.graphql_endpoint
+        assert kwargs["headers"] == {"Authorization": "bearer token"}
+        query = kwargs["json"]["query"]
+        self.queries.append(query)
+        repository = {}
+        tokens = re.finditer(
+            r'(b\d+): object\(expression: ("[^"]*")\)|(p\d+): history\(first: 1(?:, path: ("(?:[^"\\]|\\.)*"))?\)',
+            query,
+        )
+        for token in tokens:
+            if token[1]:
+                branch = json.loads(token[2])
+                commit = repository[token[1]] = {}
+            else:
+                path = json.loads(token[4]) if token[4] else ""
+                commit[token[3]] = {"nodes": [{"oid": f"{branch}:{path}"}]}
+        return FakeResponse(json.dumps({"data": {"repository": repository}}).encode("utf-8"))
+
+
+def resolve(monkeypatch, session, sources, cache=None, token=None, refresh=False, ttl=3600):
+    monkeypatch.setattr(fetcher, "get_session", lambda: session)
+    monkeypatch.setattr(fetcher, "github_token", token)
+    entries = [(None, source, "", ttl) for source in sources]
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        return fetcher.resolve_commit_hashes(entries, {} if cache is None else cache, executor, refresh)
+
+
+def test_graphql_resolves_every_source_of_a_repository_in_one_request(monkeypatch):
+    sources = [
+        "https://github.com/o/r/tree/main/packs/scripts",
+        "https://github.com/o/r/tree/main/packs/scripts/",
+        "https://github.com/o/r/blob/main/docs/README.md",
+        'https://github.com/o/r/blob/main/docs/"quoted".md',
+        "https://github.com/o/r/tree/dev/packs",
+    ]
+    session = FakeGraphQLSession()
+    hashes = resolve(monkeypatch, session, sources, token="token")
+
+    assert len(session.queries) == 1
+    assert hashes == {
+        sources[0]: "main:packs/scripts",
+        sources[1]: "main:packs/scripts",
+        sources[2]: "main:docs/README.md",
+        sources[3]: 'main:docs/"quoted".md',
+        sources[4]: "dev:packs",
+    }
+
+
+def test_graphql_batches_are_split_by_batch_size(monkeypatch):
+    monkeypatch.setattr(fetcher, "GRAPHQL_BATCH_SIZE", 2)
+    sources = [f"https://github.com/o/r/tree/main/folder{i}" for i in range(5)]
+    session = FakeGraphQLSession()
+    hashes = resolve(monkeypatch, session, sources, token="token")
+
+    assert len(session.queries) == 3
+    assert hashes == {source: f"main:folder{i}" for i, source in enumerate(sources)}
+
+
+class FakeCommitsSession:
+    """Serves the REST commits endpoint with ETags, like GitHub."""
+
+    def __init__(self, commit):
+        self.commit = commit
+        self.requests = []
+
+    def get(self, url, params=None, headers=None, **kwargs):
+        assert url == f"{fetcher.api_endpoint}/repos/o/r/commits"
+        self.requests.append(headers.get("If-None-Match"))
+        etag = f'"{self.commit}"'
+        if headers.get("If-None-Match") == etag:
+            return FakeResponse(b"", 304, {"ETag": etag})
+        return FakeResponse(json.dumps([{"sha": self.commit}]).encode("utf-8"), headers={"ETag": etag})
+
+
+SOURCE = "https://github.com/o/r/tree/main/packs"
+
+
+def cached(commit, age):
+    return {SOURCE: {"hash": commit, "etag": f'"{commit}"', "checked": fetcher.time.time() - age}}
+
+
+def test_cached_hash_is_used_until_its_ttl_expires(monkeypatch):
+    session = FakeCommitsSession("c2")
+    cache = cached("c1", age=100)
+
+    assert resolve(monkeypatch, session, [SOURCE], cache, ttl=3600) == {SOURCE: "c1"}
+    assert session.requests == []
+
+    assert resolve(monkeypatch, session, [SOURCE], cache, ttl=60) == {SOURCE: "c2"}
+    assert session.requests == ['"c1"']
+    assert cache[SOURCE]["hash"] == "c2" and cache[SOURCE]["etag"] == '"c2"'
+
+
+def test_not_modified_keeps_the_cached_hash(monkeypatch, capsys):
+    session = FakeCommitsSession("c1")
+    cache = cached("c1", age=7200)
+
+    # An ETag is revalidated over REST even with a token.
+    assert resolve(monkeypatch, session, [SOURCE], cache, token="token") == {SOURCE: "c1"}
+    assert session.requests == ['"c1"']
+    assert "Not modified: c1" in capsys.readouterr().out
+    # The 304 counts as a check, so the entry is fresh again.
+    assert fetcher.time.time() - cache[SOURCE]["checked"] < 60
+
+
+def test_refresh_revalidates_fresh_entries(monkeypatch):
+    session = FakeCommitsSession("c1")
+    cache = cached("c1", age=0)
+
+    assert resolve(monkeypatch, session, [SOURCE], cache, refresh=True) == {SOURCE: "c1"}
+    assert session.requests == ['"c1"']
+
+
+def test_stale_hash_is_used_when_revalidation_fails(monkeypatch, capsys):
+    class OfflineSession:
+        def get(self, url, **kwargs):
+            raise fetcher.requests.ConnectionError("offline")
+
+    cache = cached("c1", age=7200)
+    assert resolve(monkeypatch, OfflineSession(), [SOURCE], cache) == {SOURCE: "c1"}
+    assert "Using cached hash c1" in capsys.readouterr().out
+
+
+def sync(src, dst, mode):
+    counts = {"placed": 0, "unchanged": 0, "removed": 0}
+    fetcher.sync_tree(src, dst, mode, counts)
+    return counts
+
+
+def test_sync_tree_only_touches_what_differs(monkeypatch, tmp_path):
+    monkeypatch.setattr(fetcher, "_unsupported_methods", set())
+    src, dst = tmp_path / "src", tmp_path / "dst"
+    (src / "sub").mkdir(parents=True)
+    (src / "a.txt").write_text("a")
+    (src / "b.txt").write_text("b2")
+    (src / "sub" / "c.txt").write_text("c")
+    (dst / "stale_dir").mkdir(parents=True)
+    fetcher.shutil.copy2(src / "a.txt", dst / "a.txt")
+    (dst / "b.txt").write_text("b1")
+    (dst / "stale.txt").write_text("old")
+
+    assert sync(src, dst, "copy") == {"placed": 2, "unchanged": 1, "removed": 2, "copy": 2}
+    assert sorted(str(path.relative_to(dst)) for path in dst.rglob("*")) == [
+        "a.txt",
+        "b.txt",
+        "sub",
+        "sub/c.txt",
+    ]
+    assert (dst / "b.txt").read_text() == "b2"
+
+    assert sync(src, dst, "copy") == {"placed": 0, "unchanged": 3, "removed": 0}
+
+
+def test_sync_tree_replaces_hardlinks_when_switching_to_copies(monkeypatch, tmp_path):
+    monkeypatch.setattr(fetcher, "_unsupported_methods", set())
+    src, dst = tmp_path / "src", tmp_path / "dst"
+    src.mkdir()
+    (src / "a.txt").write_text("a")
+
+    assert sync(src, dst, "hardlink") == {"placed": 1, "unchanged": 0, "removed": 0, "hardlink": 1}
+    assert (dst / "a.txt").samefile(src / "a.txt")
+    assert sync(src, dst, "hardlink")["unchanged"] == 1
+
+    assert sync(src, dst, "copy") == {"placed": 1, "unchanged": 0, "removed": 0, "copy": 1}
+    assert not (dst / "a.txt").samefile(src / "a.txt")
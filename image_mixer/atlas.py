@@ -0,0 +1,137 @@
+import json
+import math
+import time
+from pathlib import Path
+
+from PIL import Image
+
+import png_encoder
+
+DEFAULT_NAME = "atlas"
+DEFAULT_MAX_SIZE = 2048
+
+
+class AtlasWriter:
+    """
+    Packs equally sized tiles into grid pages and writes them as they fill up.
+
+    Tiles are placed by their position in the mixer's combination order, so they
+    can arrive in any order (e.g. from a thread pool) and still land in the same
+    place every run. A page is encoded and released as soon as its last tile
+    arrives, so only the pages currently being filled are held in memory.
+
+    The index written by close() maps each tile name to its page, its pixel
+    rectangle and its UV rectangle (0-1, origin top-left).
+
+    Raises:
+        ValueError: If a tile is wider or taller than max_size.
+    """
+
+    def __init__(
+        self,
+        output_folder: Path,
+        name: str,
+        tile_size: tuple[int, int],
+        count: int,
+        max_size: int = DEFAULT_MAX_SIZE,
+        padding: int = 0,
+        png_options: dict | None = None,
+    ) -> None:
+        self.output_folder = output_folder
+        self.name = name
+        self.tile_size = tile_size
+        self.count = count
+        self.padding = padding
+        self.png_options = png_options or png_encoder.DEFAULT_OPTIONS
+
+        tile_w, tile_h = tile_size
+        if tile_w > max_size or tile_h > max_size:
+            raise ValueError(
+                f"Atlas tiles are {tile_w}x{tile_h} pixels, larger than the atlas "
+                f"max_size of {max_size}. Raise max_size to at least {max(tile_w, tile_h)}."
+            )
+        self.columns = (max_size + padding) // (tile_w + padding)
+        self.rows = (max_size + padding) // (tile_h + padding)
+        self.per_page = self.columns * self.rows
+        self.page_count = math.ceil(count / self.per_page)
+
+        self._pages: dict[int, Image.Image] = {}
+        self._remaining = {
+            page: min(self.per_page, count - page * self.per_page)
+            for page in range(self.page_count)
+        }
+        self._tiles: dict[int, tuple[str, int, int, int]] = {}
+
+        # Seconds spent encoding and writing pages, for the render time report.
+        self.encode_seconds = 0.0
+        self.write_seconds = 0.0
+
+    def page_size(self, page: int) -> tuple[int, int]:
+        """Return the pixel size of a page; the last page only has the rows it needs."""
+        tiles = min(self.per_page, self.count - page * self.per_page)
+        columns = min(self.columns, tiles)
+        rows = math.ceil(tiles / self.columns)
+        tile_w, tile_h = self.tile_size
+        return (
+            columns * (tile_w + self.padding) - self.padding,
+            rows * (tile_h + self.padding) - self.padding,
+        )
+
+    def page_path(self, page: int) -> Path:
+        return self.output_folder / f"{self.name}_{page}.png"
+
+    def add(self, position: int, tile_name: str, tile: Image.Image) -> None:
+        """Place the tile for the given combination position and flush its page if full."""
+        page, slot = divmod(position, self.per_page)
+        row, column = divmod(slot, self.columns)
+        tile_w, tile_h = self.tile_size
+        x, y = column * (tile_w + self.padding), row * (tile_h + self.padding)
+
+        canvas = self._pages.get(page)
+        if canvas is None:
+            canvas = self._pages[page] = Image.new("RGBA", self.page_size(page), (0, 0, 0, 0))
+        canvas.paste(tile, (x, y))
+        self._tiles[position] = (tile_name, page, x, y)
+
+        self._remaining[page] -= 1
+        if self._remaining[page] == 0:
+            self._flush(page)
+
+    def _flush(self, page: int) -> None:
+        canvas = self._pages.pop(page)
+        path = self.page_path(page)
+        started = time.perf_counter()
+        data = png_encoder.encode(canvas, path, self.png_options)
+        encoded = time.perf_counter()
+        path.write_bytes(data)
+        self.encode_seconds += encoded - started
+        self.write_seconds += time.perf_counter() - encoded
+
+    def close(self) -> Path:
+        """Write any unfinished pages and the JSON index, and return the index path."""
+        for page in list(self._pages):
+            self._flush(page)
+
+        tile_w, tile_h = self.tile_size
+        tiles = {}
+        for position in sorted(self._tiles):
+            tile_name, page, x, y = self._tiles[position]
+            page_w, page_h = self.page_size(page)
+            tiles[tile_name] = {
+                "page": page,
+                "rect": [x, y, tile_w, tile_h],
+                "uv": [x / page_w, y / page_h, (x + tile_w) / page_w, (y + tile_h) / page_h],
+            }
+
+        index = {
+            "tile_size": list(self.tile_size),
+            "pages": [
+                {"file": self.page_path(page).name, "size": list(self.page_size(page))}
+                for page in range(self.page_count)
+            ],
+            "tiles": tiles,
+        }
+        index_path = self.output_folder / f"{self.name}.json"
+        with index_path.open("w", encoding="utf-8") as f:
+            json.dump(index, f, indent=2)
+        return index_path
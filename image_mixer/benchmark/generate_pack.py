@@ -0,0 +1,352 @@
+"""
+Generate a synthetic Regolith project for benchmarking image_mixer.
+
+The project has the layout the filter expects when Regolith runs it (BP/, RP/
+and data/image_mixer/ in one folder) and contains:
+
+  - M items, each with a BP item file, an item_texture.json entry and a
+    random pixel-art texture
+  - N recipes cycling through shaped, shapeless and furnace, built from those items
+  - one zip mixer per recipe type (the shaped one uses a slot template)
+  - one cartesian mixer with K overlay layers of V variants each (V ** K images)
+
+Everything is derived from a seeded random generator, so the same arguments
+always produce byte-identical packs.
+
+Usage:
+    python generate_pack.py <folder> [--recipes N] [--items M] [--layers K] [--variants V]
+"""
+
+import argparse
+import json
+import shutil
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+DEFAULTS = {
+    "recipes": 300,
+    "items": 200,
+    "layers": 3,
+    "variants": 8,
+    "texture_size": 16,
+    "seed": 0,
+}
+
+NAMESPACE = "bench"
+
+# Recipe background layout in native pixels: a 3x3 grid of 18px cells and a result cell.
+_CELL = 18
+_SHAPED_SIZE = (96, 56)
+_RESULT_CELL = (76, 19)
+_FURNACE_SIZE = (64, 32)
+_CARTESIAN_SIZE = (32, 32)
+_SCALE = 2
+
+
+def _write_json(path: Path, data: dict) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+
+
+def _save_png(path: Path, pixels: np.ndarray) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    Image.fromarray(pixels, "RGBA").save(path)
+
+
+def _pixel_art(rng: np.random.Generator, size: int, soft_edges: bool = False) -> np.ndarray:
+    """
+    Return a random RGBA sprite: a few palette colours inside a transparent border.
+
+    With soft_edges, a ring of half-transparent pixels surrounds the sprite so
+    the compositors' blending path is exercised, not only the opaque fast path.
+    """
+    palette = rng.integers(0, 256, size=(int(rng.integers(3, 9)), 3), dtype=np.uint8)
+    pixels = np.zeros((size, size, 4), dtype=np.uint8)
+    pixels[..., :3] = palette[rng.integers(0, len(palette), size=(size, size))]
+
+    ys, xs = np.mgrid[:size, :size]
+    distance = np.hypot(xs - (size - 1) / 2, ys - (size - 1) / 2) / (size / 2)
+    radius = rng.uniform(0.6, 0.95)
+    pixels[..., 3] = np.where(distance <= radius, 255, 0)
+    if soft_edges:
+        pixels[..., 3] = np.where(
+            (distance > radius) & (distance <= radius + 0.15), 128, pixels[..., 3]
+        )
+    return pixels
+
+
+def _background(rng: np.random.Generator, size: tuple[int, int]) -> np.ndarray:
+    width, height = size
+    pixels = np.empty((height, width, 4), dtype=np.uint8)
+    pixels[..., :3] = rng.integers(96, 160, size=3, dtype=np.uint8)
+    pixels[..., :3] += rng.integers(0, 12, size=(height, width, 1), dtype=np.uint8)
+    pixels[..., 3] = 255
+    return pixels
+
+
+def _shaped_cells() -> list[tuple[int, int]]:
+    """Top-left corners of the nine grid cells and the result cell, in native pixels."""
+    cells = [(1 + _CELL * column, 1 + _CELL * row) for row in range(3) for column in range(3)]
+    return cells + [_RESULT_CELL]
+
+
+def _slot_template() -> np.ndarray:
+    """Paint each shaped slot's 16x16 interior (scaled) with its R marker value."""
+    width, height = _SHAPED_SIZE
+    pixels = np.zeros((height * _SCALE, width * _SCALE, 4), dtype=np.uint8)
+    pixels[..., 3] = 255
+    for slot, (x, y) in enumerate(_shaped_cells()):
+        x0, y0 = (x + 1) * _SCALE, (y + 1) * _SCALE
+        pixels[y0 : y0 + 16 * _SCALE, x0 : x0 + 16 * _SCALE, 0] = 10 * (slot + 1)
+    return pixels
+
+
+def _recipe(rng: np.random.Generator, index: int, item_ids: list[str]) -> dict:
+    identifier = f"{NAMESPACE}:recipe_{index:05d}"
+    result = {"item": str(rng.choice(item_ids))}
+    kind = index % 3
+
+    if kind == 0:
+        symbols = "ABCDEFGHI"
+        rows = int(rng.integers(1, 4))
+        columns = int(rng.integers(1, 4))
+        pattern = [
+            "".join(
+                " " if rng.random() < 0.25 else symbols[int(rng.integers(0, 4))]
+                for _ in range(columns)
+            )
+            for _ in range(rows)
+        ]
+        used = sorted({symbol for row in pattern for symbol in row if symbol != " "})
+        if not used:
+            pattern[0] = "A" + pattern[0][1:]
+            used = ["A"]
+        return {
+            "format_version": "1.12",
+            "minecraft:recipe_shaped": {
+                "description": {"identifier": identifier},
+                "tags": ["crafting_table"],
+                "pattern": pattern,
+                "key": {symbol: {"item": str(rng.choice(item_ids))} for symbol in used},
+                "result": result,
+            },
+        }
+    if kind == 1:
+        return {
+            "format_version": "1.12",
+            "minecraft:recipe_shapeless": {
+                "description": {"identifier": identifier},
+                "tags": ["crafting_table"],
+                "ingredients": [
+                    {"item": str(item)}
+                    for item in rng.choice(item_ids, size=int(rng.integers(1, 10)))
+                ],
+                "result": result,
+            },
+        }
+    return {
+        "format_version": "1.12",
+        "minecraft:recipe_furnace": {
+            "description": {"identifier": identifier},
+            "tags": ["furnace"],
+            "input": str(rng.choice(item_ids)),
+            "output": result["item"],
+        },
+    }
+
+
+def _mixers(layers: int) -> dict[str, dict]:
+    shaped_slots = [{"path": f"{{shaped_slot_{slot}}}"} for slot in range(9)]
+    shapeless_layers = [
+        {
+            "anchor": "top_left",
+            "path": f"{{shapeless_slot_{slot}}}",
+            "offset": [(x + 1) * _SCALE, (y + 1) * _SCALE],
+            "scale": {"width": 16 * _SCALE, "height": 16 * _SCALE},
+        }
+        for slot, (x, y) in enumerate(_shaped_cells()[:9])
+    ]
+    result_x, result_y = _RESULT_CELL
+
+    return {
+        "shaped.json": {
+            "output_folder": "RP/textures/output/shaped/",
+            "output_template": "{recipe_id}.png",
+            "combination_mode": "zip",
+            "slot_template": "RP/textures/bench/shaped_slots.png",
+            "layers": [
+                {"path": "RP/textures/bench/shaped_background.png", "scale": _SCALE},
+                *shaped_slots,
+                {"path": "{shaped_result}"},
+            ],
+        },
+        "shapeless.json": {
+            "output_folder": "RP/textures/output/shapeless/",
+            # {recipe_id} follows the shaped recipes unless a whitelist excludes them.
+            "output_template": "{index}.png",
+            "combination_mode": "zip",
+            "layers": [
+                {"path": "RP/textures/bench/shaped_background.png", "scale": _SCALE},
+                *shapeless_layers,
+                {
+                    "anchor": "top_left",
+                    "path": "{shapeless_result}",
+                    "offset": [(result_x + 1) * _SCALE, (result_y + 1) * _SCALE],
+                    "scale": {"width": 16 * _SCALE, "height": 16 * _SCALE},
+                },
+            ],
+        },
+        "furnace.json": {
+            "output_folder": "RP/textures/output/furnace/",
+            "output_template": "{recipe_id}.png",
+            "combination_mode": "zip",
+            "recipe_generation": {"tag_whitelist": ["furnace"], "id_whitelist": []},
+            "layers": [
+                {"path": "RP/textures/bench/furnace_background.png", "scale": _SCALE},
+                {
+                    "anchor": "top_left",
+                    "path": "{furnace_slot_0}",
+                    "offset": [8 * _SCALE, 8 * _SCALE],
+                    "scale": {"width": 16 * _SCALE, "height": 16 * _SCALE},
+                },
+                {
+                    "anchor": "top_left",
+                    "path": "{furnace_slot_1}",
+                    "offset": [40 * _SCALE, 8 * _SCALE],
+                    "scale": {"width": 16 * _SCALE, "height": 16 * _SCALE},
+                },
+            ],
+        },
+        "cartesian.json": {
+            "output_folder": "RP/textures/output/cartesian/",
+            "output_template": "{index}.png",
+            "combination_mode": "cartesian",
+            "layers": [
+                {"path": "RP/textures/bench/cartesian_background.png", "scale": 4},
+                *(
+                    {
+                        "path": f"RP/textures/bench/layer_{layer}/",
+                        "scale": 4,
+                        "anchor": "center",
+                        "offset": [4 * layer, 4 * layer],
+                    }
+                    for layer in range(layers)
+                ),
+            ],
+        },
+    }
+
+
+def generate_pack(
+    folder: Path,
+    recipes: int = DEFAULTS["recipes"],
+    items: int = DEFAULTS["items"],
+    layers: int = DEFAULTS["layers"],
+    variants: int = DEFAULTS["variants"],
+    texture_size: int = DEFAULTS["texture_size"],
+    seed: int = DEFAULTS["seed"],
+) -> dict:
+    """
+    Write a synthetic project into folder, replacing anything already there.
+
+    Returns the parameters used and the number of images each mixer will produce.
+
+    Raises:
+        ValueError: If any count is less than 1.
+    """
+    params = {
+        "recipes": recipes,
+        "items": items,
+        "layers": layers,
+        "variants": variants,
+        "texture_size": texture_size,
+        "seed": seed,
+    }
+    for name, value in params.items():
+        if name != "seed" and value < 1:
+            raise ValueError(f"Invalid {name} '{value}'. Must be at least 1.")
+
+    rng = np.random.default_rng(seed)
+    folder = Path(folder)
+    if folder.exists():
+        shutil.rmtree(folder)
+
+    bp, rp, data = folder / "BP", folder / "RP", folder / "data" / "image_mixer"
+
+    item_ids = [f"{NAMESPACE}:item_{i:05d}" for i in range(items)]
+    texture_data = {}
+    for i, identifier in enumerate(item_ids):
+        shortname = f"{NAMESPACE}.item_{i:05d}"
+        _write_json(
+            bp / "items" / f"item_{i:05d}.json",
+            {
+                "format_version": "1.20.0",
+                "minecraft:item": {
+                    "description": {"identifier": identifier},
+                    "components": {"minecraft:icon": shortname},
+                },
+            },
+        )
+        texture_data[shortname] = {"textures": f"textures/items/item_{i:05d}"}
+        _save_png(rp / "textures" / "items" / f"item_{i:05d}.png", _pixel_art(rng, texture_size))
+    _write_json(
+        rp / "textures" / "item_texture.json",
+        {"resource_pack_name": NAMESPACE, "texture_name": "atlas.items", "texture_data": texture_data},
+    )
+
+    counts = {"shaped.json": 0, "shapeless.json": 0, "furnace.json": 0}
+    for i in range(recipes):
+        recipe = _recipe(rng, i, item_ids)
+        _write_json(bp / "recipes" / f"recipe_{i:05d}.json", recipe)
+        counts[("shaped.json", "shapeless.json", "furnace.json")[i % 3]] += 1
+    counts["cartesian.json"] = variants**layers
+
+    textures = rp / "textures" / "bench"
+    _save_png(textures / "shaped_background.png", _background(rng, _SHAPED_SIZE))
+    _save_png(textures / "shaped_slots.png", _slot_template())
+    _save_png(textures / "furnace_background.png", _background(rng, _FURNACE_SIZE))
+    _save_png(textures / "cartesian_background.png", _background(rng, _CARTESIAN_SIZE))
+    for layer in range(layers):
+        for variant in range(variants):
+            _save_png(
+                textures / f"layer_{layer}" / f"variant_{variant:03d}.png",
+                _pixel_art(rng, texture_size, soft_edges=layer % 2 == 1),
+            )
+
+    _write_json(data / "texture_map.json", {})
+    for name, mixer in _mixers(layers).items():
+        _write_json(data / "mixers" / name, mixer)
+
+    return {"params": params, "images": counts}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic image_mixer project.")
+    parser.add_argument("folder", type=Path)
+    parser.add_argument("--recipes", type=int, default=DEFAULTS["recipes"])
+    parser.add_argument("--items", type=int, default=DEFAULTS["items"])
+    parser.add_argument("--layers", type=int, default=DEFAULTS["layers"])
+    parser.add_argument("--variants", type=int, default=DEFAULTS["variants"])
+    parser.add_argument("--texture-size", type=int, default=DEFAULTS["texture_size"])
+    parser.add_argument("--seed", type=int, default=DEFAULTS["seed"])
+    args = parser.parse_args()
+
+    try:
+        summary = generate_pack(
+            args.folder,
+            recipes=args.recipes,
+            items=args.items,
+            layers=args.layers,
+            variants=args.variants,
+            texture_size=args.texture_size,
+            seed=args.seed,
+        )
+    except ValueError as e:
+        raise SystemExit(f"[ERROR] {e}") from None
+    print(
+        f"[INFO] Generated '{args.folder}': "
+        + ", ".join(f"{name} {count} images" for name, count in summary["images"].items())
+    )
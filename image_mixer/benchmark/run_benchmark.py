@@ -0,0 +1,313 @@
+"""
+Benchmark image_mixer end to end on a synthetic project.
+
+Generates a project with generate_pack.py, runs the filter on it with
+--profile in a fresh Python process (the way Regolith runs it), and appends
+one JSON record per benchmark to a results file:
+
+  - wall-clock seconds and peak resident memory of each filter run
+  - every mixer's phase times, render stage times, throughput and cache counters,
+    taken from the image_mixer_report.json the filter writes
+  - the pack parameters, mixer overrides and machine details, so records from
+    different commits can be compared
+
+Each repeat deletes the previous run's outputs and manifest first, so every
+run renders everything. The recipe parse cache is kept between repeats (the
+first run is cold) unless --cold is given.
+
+Usage:
+    python run_benchmark.py [--recipes N] [--items M] [--layers K] [--variants V]
+                            [--repeat R] [--mixer-options JSON] [--fast]
+                            [--results FILE] [--label TEXT]
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from generate_pack import DEFAULTS, generate_pack
+
+FILTER_SCRIPT = Path(__file__).resolve().parent.parent / "image_mixer.py"
+REPORT_FILENAME = "image_mixer_report.json"
+MIB = 1024 * 1024
+
+
+def _git_commit() -> str | None:
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=FILTER_SCRIPT.parent,
+            capture_output=True,
+            text=True,
+        )
+    except OSError:
+        return None
+    return result.stdout.strip() or None
+
+
+def _load_mixers(project: Path) -> dict[str, dict]:
+    mixers = {}
+    for path in sorted((project / "data" / "image_mixer" / "mixers").glob("*.json")):
+        with path.open("r", encoding="utf-8") as f:
+            mixers[path.name] = json.load(f)
+    return mixers
+
+
+def _apply_mixer_options(project: Path, options: dict) -> None:
+    """Merge the given settings into every mixer of the project."""
+    for name, mixer in _load_mixers(project).items():
+        mixer.update(options)
+        path = project / "data" / "image_mixer" / "mixers" / name
+        with path.open("w", encoding="utf-8") as f:
+            json.dump(mixer, f, indent=2)
+
+
+def _clean_outputs(project: Path, cold: bool) -> None:
+    """Remove the outputs, manifest (and with cold, the recipe cache) of a previous run."""
+    for mixer in _load_mixers(project).values():
+        shutil.rmtree(project / mixer["output_folder"], ignore_errors=True)
+    generated = ["manifest.json"] + (["recipe_cache.json"] if cold else [])
+    for name in generated:
+        (project / "data" / "image_mixer" / name).unlink(missing_ok=True)
+
+
+def _run_filter(project: Path, filter_args: list[str], log_path: Path) -> tuple[float, int | None]:
+    """
+    Run the filter in project and return its wall-clock seconds and peak RSS in bytes.
+
+    The peak RSS comes from os.wait4 and is None where that is not available.
+    Raises SystemExit if the filter fails.
+    """
+    with log_path.open("w", encoding="utf-8") as log:
+        started = time.perf_counter()
+        process = subprocess.Popen(
+            [sys.executable, str(FILTER_SCRIPT), *filter_args],
+            cwd=project,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+        )
+        peak_rss = None
+        if hasattr(os, "wait4"):
+            _, status, usage = os.wait4(process.pid, 0)
+            process.returncode = os.waitstatus_to_exitcode(status)
+            # ru_maxrss is in bytes on macOS and in kilobytes elsewhere.
+            peak_rss = usage.ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+        else:
+            process.wait()
+        wall = time.perf_counter() - started
+
+    if process.returncode != 0:
+        raise SystemExit(
+            f"[ERROR] image_mixer exited with code {process.returncode}. See '{log_path}'."
+        )
+    return wall, peak_rss
+
+
+def _collect_reports(project: Path) -> dict[str, dict]:
+    reports = {}
+    for name, mixer in _load_mixers(project).items():
+        report_path = project / mixer["output_folder"] / REPORT_FILENAME
+        if not report_path.exists():
+            print(f"[WARNING] Mixer '{name}' wrote no report.")
+            continue
+        with report_path.open("r", encoding="utf-8") as f:
+            report = json.load(f)
+        reports[name] = {
+            key: report.get(key)
+            for key in (
+                "combinations",
+                "rendered",
+                "skipped",
+                "deduplicated",
+                "phases",
+                "render_times",
+                "images_per_second",
+                "cache",
+                "peak_rss_bytes",
+            )
+        }
+    return reports
+
+
+def _summarize(runs: list[dict]) -> dict:
+    walls = [run["wall_seconds"] for run in runs]
+    rendered = sum(
+        report["rendered"] or 0 for report in runs[0]["mixers"].values()
+    )
+    peaks = [run["peak_rss_bytes"] for run in runs if run["peak_rss_bytes"] is not None]
+    median = statistics.median(walls)
+    return {
+        "wall_seconds_median": median,
+        "wall_seconds_min": min(walls),
+        "wall_seconds_max": max(walls),
+        "images": rendered,
+        "images_per_second": rendered / median if median else None,
+        "peak_rss_bytes": max(peaks) if peaks else None,
+    }
+
+
+def _previous_record(results_path: Path, record: dict) -> dict | None:
+    """Return the last record in the results file with the same pack and settings."""
+    if not results_path.exists():
+        return None
+    previous = None
+    with results_path.open("r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                other = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if all(other.get(key) == record[key] for key in ("pack", "mixer_options", "filter_args")):
+                previous = other
+    return previous
+
+
+def run_benchmark(
+    pack: dict,
+    repeat: int = 3,
+    mixer_options: dict | None = None,
+    filter_args: list[str] | None = None,
+    cold: bool = False,
+    project: Path | None = None,
+) -> dict:
+    """
+    Generate a project, run the filter on it repeat times and return the benchmark record.
+
+    Args:
+        pack: generate_pack keyword arguments (recipes, items, layers, ...).
+        repeat: Number of filter runs.
+        mixer_options: Settings merged into every generated mixer, e.g. {"compositor": "numpy"}.
+        filter_args: Extra filter arguments besides --profile, e.g. ["--fast"].
+        cold: Delete the recipe parse cache before every run, not only the first.
+        project: Folder to generate the project in. A temporary folder is used and
+            removed afterwards if None.
+    """
+    mixer_options = mixer_options or {}
+    filter_args = filter_args or []
+    temporary = project is None
+    project = Path(tempfile.mkdtemp(prefix="image_mixer_bench_")) if temporary else project
+
+    try:
+        generated = generate_pack(project, **pack)
+        _apply_mixer_options(project, mixer_options)
+
+        runs = []
+        for number in range(1, repeat + 1):
+            _clean_outputs(project, cold)
+            recipe_cache = "warm" if number > 1 and not cold else "cold"
+            wall, peak_rss = _run_filter(
+                project, ["--profile", *filter_args], project / f"run_{number}.log"
+            )
+            runs.append(
+                {
+                    "wall_seconds": wall,
+                    "peak_rss_bytes": peak_rss,
+                    "recipe_cache": recipe_cache,
+                    "mixers": _collect_reports(project),
+                }
+            )
+            print(f"[INFO] Run {number}/{repeat}: {wall:.2f}s ({recipe_cache} recipe cache).")
+    finally:
+        if temporary:
+            shutil.rmtree(project, ignore_errors=True)
+
+    return {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "machine": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "pack": generated["params"],
+        "mixer_options": mixer_options,
+        "filter_args": filter_args,
+        "images": generated["images"],
+        "runs": runs,
+        "summary": _summarize(runs),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark image_mixer on a synthetic project.")
+    parser.add_argument("--recipes", type=int, default=DEFAULTS["recipes"])
+    parser.add_argument("--items", type=int, default=DEFAULTS["items"])
+    parser.add_argument("--layers", type=int, default=DEFAULTS["layers"])
+    parser.add_argument("--variants", type=int, default=DEFAULTS["variants"])
+    parser.add_argument("--texture-size", type=int, default=DEFAULTS["texture_size"])
+    parser.add_argument("--seed", type=int, default=DEFAULTS["seed"])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--mixer-options",
+        type=json.loads,
+        default={},
+        help='JSON object merged into every mixer, e.g. \'{"executor": "process"}\'.',
+    )
+    parser.add_argument("--fast", action="store_true", help="Pass --fast to the filter.")
+    parser.add_argument("--cold", action="store_true", help="Clear the recipe cache before every run.")
+    parser.add_argument("--project", type=Path, help="Generate the project here and keep it.")
+    parser.add_argument("--results", type=Path, default=Path("benchmark_results.jsonl"))
+    parser.add_argument("--label", help="Free-form note stored with the record.")
+    args = parser.parse_args()
+
+    if args.repeat < 1:
+        raise SystemExit(f"[ERROR] Invalid repeat '{args.repeat}'. Must be at least 1.")
+    if not isinstance(args.mixer_options, dict):
+        raise SystemExit("[ERROR] --mixer-options must be a JSON object.")
+
+    pack = {
+        "recipes": args.recipes,
+        "items": args.items,
+        "layers": args.layers,
+        "variants": args.variants,
+        "texture_size": args.texture_size,
+        "seed": args.seed,
+    }
+    try:
+        record = run_benchmark(
+            pack,
+            repeat=args.repeat,
+            mixer_options=args.mixer_options,
+            filter_args=["--fast"] if args.fast else [],
+            cold=args.cold,
+            project=args.project,
+        )
+    except ValueError as e:
+        raise SystemExit(f"[ERROR] {e}") from None
+    record["label"] = args.label
+
+    summary = record["summary"]
+    print(
+        f"[INFO] {summary['images']} images, median {summary['wall_seconds_median']:.2f}s "
+        f"({summary['images_per_second']:.1f} images/s end to end)"
+        + (
+            f", peak RSS {summary['peak_rss_bytes'] / MIB:.0f} MiB."
+            if summary["peak_rss_bytes"] is not None
+            else "."
+        )
+    )
+    for name, report in record["runs"][-1]["mixers"].items():
+        phases = ", ".join(f"{phase} {seconds:.2f}s" for phase, seconds in report["phases"].items())
+        print(f"[INFO]   {name}: {report['rendered']} rendered, {phases}.")
+
+    previous = _previous_record(args.results, record)
+    if previous:
+        before = previous["summary"]["wall_seconds_median"]
+        change = (summary["wall_seconds_median"] - before) / before * 100 if before else 0.0
+        print(
+            f"[INFO] Previous run with the same settings ({previous.get('commit')}, "
+            f"{previous['timestamp']}): median {before:.2f}s ({change:+.1f}%)."
+        )
+
+    with args.results.open("a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+    print(f"[INFO] Results appended to '{args.results}'.")
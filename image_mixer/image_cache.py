@@ -1,22 +1,260 @@
+import concurrent.futures
+import threading
+from collections import OrderedDict
 from pathlib import Path
 from PIL import Image
 
-_cache: dict[Path, Image.Image] = {}
+# First tier: decoded RGBA images keyed by path. Unbounded unless a byte ceiling
+# is configured, in which case least-recently-used images are evicted first.
+_cache: OrderedDict[Path, Image.Image] = OrderedDict()
+_cache_bytes = 0
+_max_bytes: int | None = None
+_sizes: dict[Path, tuple[int, int]] = {}
+
+# Second tier: overlays that have already been resized for a layer, keyed by
+# (path, size, resample). Bounded by a byte budget with least-recently-used eviction.
+DEFAULT_RESIZED_MAX_BYTES = 64 * 1024 * 1024
+
+_resized: OrderedDict[tuple, Image.Image] = OrderedDict()
+_resized_bytes = 0
+_resized_max_bytes = DEFAULT_RESIZED_MAX_BYTES
+_lock = threading.Lock()
+
+# Paths currently being decoded, so concurrent misses on the same file wait for
+# the first decode instead of starting their own.
+_loading: dict[Path, threading.Event] = {}
+
+_stats = {
+    "hits": 0,
+    "misses": 0,
+    "resized_hits": 0,
+    "resized_misses": 0,
+    "evictions": 0,
+    "peak_bytes": 0,
+}
+
+
+def _image_bytes(img: Image.Image) -> int:
+    return img.width * img.height * len(img.getbands())
+
+
+def _record_peak() -> None:
+    # Caller must hold _lock.
+    _stats["peak_bytes"] = max(_stats["peak_bytes"], _cache_bytes + _resized_bytes)
+
+
+def _store(path: Path, img: Image.Image) -> None:
+    """Insert a decoded image and evict least-recently-used ones over the ceiling."""
+    # Caller must hold _lock.
+    global _cache_bytes
+
+    if path in _cache:
+        return
+    _cache[path] = img
+    _cache_bytes += _image_bytes(img)
+    _record_peak()
+    while _max_bytes is not None and _cache_bytes > _max_bytes and len(_cache) > 1:
+        _, evicted = _cache.popitem(last=False)
+        _cache_bytes -= _image_bytes(evicted)
+        _stats["evictions"] += 1
+
+
+def size(path: Path) -> tuple[int, int]:
+    """
+    Return an image's pixel size without keeping it decoded.
+
+    Sizes are remembered even after the image itself has been evicted, so
+    computing a layer's target size never forces a re-decode.
+    """
+    with _lock:
+        known = _sizes.get(path)
+    if known is None:
+        with Image.open(path) as img:
+            known = img.size
+        with _lock:
+            _sizes[path] = known
+    return known
 
 
 def get(path: Path) -> Image.Image:
     """
     Return a cached RGBA image for the given path, loading it on first access.
 
-    The cache persists for the lifetime of the process. Since images are only
-    ever read (never modified in-place), sharing the same object across threads
-    is safe as long as callers do not mutate the returned image.
+    Images stay cached until evicted by the byte ceiling or cleared. Since images
+    are only ever read (never modified in-place), sharing the same object across
+    threads is safe as long as callers do not mutate the returned image.
+
+    Loading is single-flight: if another thread is already decoding the same
+    path, this call waits for that decode rather than repeating it.
+    """
+    while True:
+        with _lock:
+            img = _cache.get(path)
+            if img is not None:
+                _cache.move_to_end(path)
+                _stats["hits"] += 1
+                return img
+            loading = _loading.get(path)
+            if loading is None:
+                loading = _loading[path] = threading.Event()
+                break
+        # Another thread is decoding this path. Check the cache again once it is
+        # done; if that decode failed (or was evicted at once), load it ourselves.
+        loading.wait()
+
+    try:
+        img = Image.open(path).convert("RGBA")
+        with _lock:
+            _stats["misses"] += 1
+            _store(path, img)
+    finally:
+        with _lock:
+            del _loading[path]
+        loading.set()
+    return img
+
+
+def get_resized(
+    path: Path, size: tuple[int, int], resample: Image.Resampling
+) -> Image.Image:
+    """
+    Return the image at path resized to size, memoized across calls.
+
+    Thread-safe. If the source already has the requested size it is returned
+    unchanged. Like get(), callers must not mutate the returned image.
+    """
+    global _resized_bytes
+
+    key = (path, size, resample)
+    with _lock:
+        img = _resized.get(key)
+        if img is not None:
+            _resized.move_to_end(key)
+            _stats["resized_hits"] += 1
+            return img
+
+    source = get(path)
+    if source.size == size:
+        return source
+
+    # Resize outside the lock; two threads may race on the same key, which
+    # only costs a duplicate resize.
+    img = source.resize(size, resample=resample)
+
+    with _lock:
+        _stats["resized_misses"] += 1
+        if key not in _resized:
+            _resized[key] = img
+            _resized_bytes += _image_bytes(img)
+            _record_peak()
+            while _resized_bytes > _resized_max_bytes and len(_resized) > 1:
+                _, evicted = _resized.popitem(last=False)
+                _resized_bytes -= _image_bytes(evicted)
+    return img
+
+
+def configure(
+    max_bytes: int | None = None, resized_max_bytes: int | None = None
+) -> None:
+    """
+    Set the cache limits.
+
+    Args:
+        max_bytes: Ceiling for decoded images. None means unbounded.
+        resized_max_bytes: Budget for resized overlays. None restores the default.
+    """
+    global _max_bytes, _resized_max_bytes
+    with _lock:
+        _max_bytes = max_bytes
+        _resized_max_bytes = (
+            DEFAULT_RESIZED_MAX_BYTES if resized_max_bytes is None else resized_max_bytes
+        )
+
+
+def preload(paths: set[Path], workers: int | None = None) -> int:
+    """
+    Decode the given paths in parallel and return how many were loaded.
+
+    Pillow releases the GIL while decoding, so a thread pool overlaps the work.
+    With a decoded ceiling configured, paths beyond what fits (by header size)
+    are left to load lazily instead of evicting each other.
+    """
+    selected = sorted(paths)
+    if _max_bytes is not None:
+        total = 0
+        for count, path in enumerate(selected):
+            width, height = size(path)
+            total += width * height * 4
+            if total > _max_bytes:
+                selected = selected[:count]
+                break
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        # list() re-raises the first decode error, if any.
+        list(executor.map(get, selected))
+    return len(selected)
+
+
+def stats() -> dict[str, int]:
+    """Return a snapshot of the cache counters and the peak cached bytes."""
+    with _lock:
+        return dict(_stats)
+
+
+def reset_stats() -> None:
+    """Zero the cache counters and restart peak tracking from the current size."""
+    with _lock:
+        for key in _stats:
+            _stats[key] = 0
+        _record_peak()
+
+
+def merge_stats(total: dict[str, int], other: dict[str, int]) -> dict[str, int]:
+    """Combine counters from several processes: sums, except peak_bytes which takes the max."""
+    merged = dict(total)
+    for key, value in other.items():
+        if key == "peak_bytes":
+            merged[key] = max(merged.get(key, 0), value)
+        else:
+            merged[key] = merged.get(key, 0) + value
+    return merged
+
+
+def snapshot(paths: set[Path]) -> dict[Path, Image.Image]:
+    """
+    Decode the given paths and return them as a dict, for seeding worker processes.
+
+    Stops adding images once the decoded ceiling would be exceeded, so a
+    bounded cache is not defeated by shipping every image to every worker.
+    """
+    images = {}
+    total = 0
+    for path in sorted(paths):
+        img = get(path)
+        total += _image_bytes(img)
+        if _max_bytes is not None and total > _max_bytes:
+            break
+        images[path] = img
+    return images
+
+
+def seed(images: dict[Path, Image.Image]) -> None:
+    """
+    Populate the cache with already-decoded images.
+
+    Used by process-pool workers so each one receives the parent's decoded
+    images once at startup instead of re-reading every file from disk.
     """
-    if path not in _cache:
-        _cache[path] = Image.open(path).convert("RGBA")
-    return _cache[path]
+    with _lock:
+        for path, img in images.items():
+            _store(path, img)
 
 
 def clear() -> None:
     """Evict all cached images."""
-    _cache.clear()
+    global _cache_bytes, _resized_bytes
+    with _lock:
+        _cache.clear()
+        _cache_bytes = 0
+        _resized.clear()
+        _resized_bytes = 0
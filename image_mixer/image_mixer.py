@@ -1,13 +1,30 @@
 import json
 import itertools
+import math
+import os
 import re
+import shutil
+import sys
+import threading
+import time
 import warnings
 import concurrent.futures
+from collections.abc import Callable, Iterable, Iterator
 from pathlib import Path
 
+try:
+    import resource
+except ImportError:  # Not available on Windows.
+    resource = None
+
+import numpy as np
 from PIL import Image
 
+import atlas
 import image_cache
+import numpy_compositor
+import output_manifest
+import png_encoder
 import recipe_image_gen as rig
 from slot_template import read_slot_template
 
@@ -16,6 +33,19 @@ SCHEMA_URL = "https://raw.githubusercontent.com/thePixelmancer/regolith-filters/
 
 BLANK_VALUES = {None, "none", "None", ""}
 
+EXECUTORS = ("thread", "process")
+DEFAULT_CHUNK_SIZE = 64
+IN_FLIGHT_PER_WORKER = 4
+COMPOSITORS = ("pillow", "numpy")
+CACHE_SCOPES = ("process", "mixer")
+DEDUPE_METHODS = ("hardlink", "copy")
+MIB = 1024 * 1024
+REPORT_FILENAME = "image_mixer_report.json"
+PLAN_SAMPLES = 16
+# Cores the thread executor is assumed to keep busy in plan mode. Compositing
+# holds the GIL for most of each image, so extra threads add little.
+THREAD_PARALLELISM = 1
+
 
 def _build_variable_map(
     id_whitelist: list[str] | None,
@@ -25,6 +55,8 @@ def _build_variable_map(
     Build the recipe variable map for a single mixer, applying any whitelists.
 
     Called once per mixer so that different mixers can filter different recipe subsets.
+    The recipes themselves are resolved only once per process (rig.get_recipe_index),
+    so each call after the first just applies the whitelists.
     Raises SystemExit with a clear message if any recipe item cannot be resolved.
     """
     try:
@@ -108,6 +140,85 @@ def zip_combinations(all_layers: list[list[dict]]) -> list[tuple[dict, ...]]:
     ]
 
 
+def iter_combinations(
+    all_layers: list[list[dict]], combination_mode: str, indices: range | None = None
+) -> Iterator[tuple[dict, ...]]:
+    """
+    Lazily yield combinations in the same order as the list-building strategies.
+
+    Nothing is materialized up front, so memory use does not grow with the
+    size of the cartesian product. If indices is given, only the combinations
+    at those indices are yielded (e.g. one shard of a larger run).
+    """
+    total = combination_count(all_layers, combination_mode)
+    if indices is None:
+        indices = range(total)
+    if combination_mode == "cartesian" and indices == range(total):
+        return itertools.product(*all_layers)
+    return (combination_at(all_layers, combination_mode, i) for i in indices)
+
+
+def shard_range(
+    total: int,
+    shard: tuple[int, int] | None = None,
+    index_range: tuple[int, int] | None = None,
+) -> range:
+    """
+    Return the combination indices a single job should render.
+
+    Args:
+        total: Number of combinations in the mixer.
+        shard: (k, n) to render the k-th of n contiguous, near-equal shards (1-based).
+        index_range: (start, stop) to render an explicit half-open index range,
+            clamped to the available combinations. Applied after shard.
+    """
+    indices = range(total)
+    if shard:
+        k, n = shard
+        if not 1 <= k <= n:
+            raise ValueError(f"Invalid shard {k}/{n}. Expected 1 <= k <= n.")
+        indices = range(total * (k - 1) // n, total * k // n)
+    if index_range:
+        start, stop = index_range
+        indices = indices[start:stop]
+    return indices
+
+
+def combination_count(all_layers: list[list[dict]], combination_mode: str) -> int:
+    """Return how many combinations a mode yields, without building any of them."""
+    if combination_mode == "zip":
+        if any(len(layer) == 0 for layer in all_layers):
+            return 0
+        max_len = max(len(layer) for layer in all_layers)
+        for layer in all_layers:
+            if len(layer) not in (1, max_len):
+                raise ValueError(
+                    f"Layer with {len(layer)} variants cannot be zipped to length {max_len}."
+                )
+        return max_len
+    return math.prod(len(layer) for layer in all_layers)
+
+
+def combination_at(
+    all_layers: list[list[dict]], combination_mode: str, index: int
+) -> tuple[dict, ...]:
+    """
+    Return the combination at a given index, matching the order of the list
+    produced by the corresponding combination strategy.
+
+    Cartesian indices are decoded as mixed-radix numbers with the last layer
+    varying fastest, exactly like itertools.product.
+    """
+    if combination_mode == "zip":
+        return tuple(layer[index] if len(layer) > 1 else layer[0] for layer in all_layers)
+
+    picks = []
+    for layer in reversed(all_layers):
+        index, pick = divmod(index, len(layer))
+        picks.append(layer[pick])
+    return tuple(reversed(picks))
+
+
 # -------------------------------------------------------------------------------------- #
 # Layer variant resolution
 # -------------------------------------------------------------------------------------- #
@@ -143,9 +254,16 @@ def get_layer_variants(layer: dict, variable_map: dict[str, list]) -> list[dict]
     Handles: blank paths, variable placeholders, file lists, directories, and single files.
     """
     layer_path = layer["path"]
+    blend_mode = layer.get("blend_mode", "normal")
+    if blend_mode not in numpy_compositor.BLEND_MODES:
+        raise ValueError(
+            f"Invalid blend_mode '{blend_mode}'. Must be one of: "
+            + ", ".join(numpy_compositor.BLEND_MODES)
+            + "."
+        )
     layer_props = {
         "offset": layer.get("offset", [0, 0]),
-        "blend_mode": layer.get("blend_mode", "normal"),
+        "blend_mode": blend_mode,
         "anchor": layer.get("anchor", "center"),
         "scale": layer.get("scale", None),
         "resample": layer.get("resample", None),
@@ -235,14 +353,11 @@ def _get_resample(method: str | None) -> Image.Resampling:
     )
 
 
-def _scale_image(
-    img: Image.Image, scale: float | list | dict | None, resample: Image.Resampling
-) -> Image.Image:
-    """Scale an image using a scalar, (x, y) tuple, or {width, height} dict."""
-    if scale is None:
-        return img
-
-    w, h = img.size
+def _scaled_size(
+    size: tuple[int, int], scale: float | list | dict | None
+) -> tuple[int, int]:
+    """Return the size an image of the given size has after applying scale."""
+    w, h = size
     if isinstance(scale, (int, float)):
         w, h = int(w * scale), int(h * scale)
     elif isinstance(scale, (list, tuple)) and len(scale) == 2:
@@ -250,8 +365,16 @@ def _scale_image(
     elif isinstance(scale, dict):
         w = int(scale.get("width", w))
         h = int(scale.get("height", h))
+    return w, h
+
 
-    return img.resize((w, h), resample=resample)
+def _scale_image(
+    img: Image.Image, scale: float | list | dict | None, resample: Image.Resampling
+) -> Image.Image:
+    """Scale an image using a scalar, (x, y) tuple, or {width, height} dict."""
+    if scale is None:
+        return img
+    return img.resize(_scaled_size(img.size, scale), resample=resample)
 
 
 def _get_paste_position(
@@ -300,8 +423,69 @@ def _format_filename(template: str, idx: int, combination: tuple[dict, ...]) ->
             return f"image_{idx}.png"
 
 
+def _place_overlay(
+    layer: dict, canvas_size: tuple[int, int]
+) -> tuple[Image.Image, tuple[int, int]]:
+    """
+    Return a layer's overlay image, resized as configured, and its paste position.
+
+    Resized overlays come from the image cache's resized tier, so a texture used
+    in thousands of combinations is only resized once per target size.
+    """
+    path = layer["path"]
+    resample = _get_resample(layer.get("resample"))
+
+    # Slot bbox from a template: position and size come directly from the bbox.
+    # Fallback: use the manually specified scale / anchor / offset.
+    if slot_bbox := layer.get("slot_bbox"):
+        x_min, y_min, x_max, y_max = slot_bbox
+        slot_w = x_max - x_min + 1
+        slot_h = y_max - y_min + 1
+        overlay = image_cache.get_resized(path, (slot_w, slot_h), resample)
+        return overlay, (x_min, y_min)
+
+    size = _scaled_size(image_cache.size(path), layer.get("scale"))
+    overlay = image_cache.get_resized(path, size, resample)
+    pos = _get_paste_position(
+        layer.get("anchor", "center"),
+        canvas_size,
+        overlay.size,
+        tuple(layer.get("offset", [0, 0])),
+    )
+    return overlay, pos
+
+
+def _reuse_prefix(
+    overlays: tuple[dict, ...], prefix_cache: list, root: tuple
+) -> int:
+    """
+    Trim prefix_cache to the longest run of leading overlays it shares with this
+    combination and return that run's length.
+
+    prefix_cache[0] is (root, base) and prefix_cache[i] is (overlay, composite after
+    overlays[:i]). Overlays are compared by identity: every combination built from
+    the same expanded layers reuses the same variant dicts, so identical variants
+    are the same object.
+    """
+    if not prefix_cache or prefix_cache[0][0] != root:
+        prefix_cache[:] = [(root, None)]
+
+    depth = 0
+    while (
+        depth < len(overlays)
+        and depth + 1 < len(prefix_cache)
+        and prefix_cache[depth + 1][0] is overlays[depth]
+    ):
+        depth += 1
+    del prefix_cache[depth + 1 :]
+    return depth
+
+
 def composite_layers(
-    combination: tuple[dict, ...], base_img: Image.Image
+    combination: tuple[dict, ...],
+    base_img: Image.Image,
+    compositor: str = "pillow",
+    prefix_cache: list | None = None,
 ) -> Image.Image:
     """
     Composite a tuple of layer variants onto a copy of base_img.
@@ -309,54 +493,466 @@ def composite_layers(
     The base image is passed in pre-loaded and pre-scaled so it is not
     re-opened on every combination. Overlay images are fetched from the
     image cache to avoid redundant file IO across combinations.
+
+    The 'numpy' compositor blends each overlay only over its bounding box,
+    in place on a single canvas array. It produces the same pixels as the
+    default 'pillow' compositor, which blends a full-size layer per overlay.
+    Layers with a blend_mode other than 'normal' go through
+    numpy_compositor.blend_region with either compositor.
+
+    If a prefix_cache list is given, the intermediate composites of this
+    combination are kept in it, and the next call only blends the overlays
+    after the leading run it shares with this one. The list must not be
+    shared between threads.
     """
-    result = base_img.copy()
+    overlays = combination[1:]
+    depth = 0
+    if prefix_cache is not None:
+        depth = _reuse_prefix(overlays, prefix_cache, (id(base_img), compositor))
+
+    if compositor == "numpy":
+        if depth:
+            canvas = prefix_cache[depth][1].copy()
+        else:
+            canvas = numpy_compositor.to_array(base_img)
+        for i, layer in enumerate(overlays[depth:], start=depth):
+            if layer["path"]:
+                overlay, pos = _place_overlay(layer, base_img.size)
+                blend_mode = layer.get("blend_mode", "normal")
+                if blend_mode == "normal":
+                    numpy_compositor.alpha_composite_region(canvas, np.asarray(overlay), pos)
+                else:
+                    numpy_compositor.blend_region(canvas, np.asarray(overlay), pos, blend_mode)
+            # The last overlay usually varies fastest, so it is not worth a copy.
+            if prefix_cache is not None and i < len(overlays) - 1:
+                prefix_cache.append((layer, canvas.copy()))
+        return numpy_compositor.to_image(canvas)
+
+    result = prefix_cache[depth][1] if depth else base_img.copy()
+
+    for layer in overlays[depth:]:
+        if layer["path"]:
+            overlay, pos = _place_overlay(layer, result.size)
+            blend_mode = layer.get("blend_mode", "normal")
+            if blend_mode == "normal":
+                temp = Image.new("RGBA", result.size, (0, 0, 0, 0))
+                temp.paste(overlay, pos, overlay)
+                result = Image.alpha_composite(result, temp)
+            else:
+                canvas = numpy_compositor.to_array(result)
+                numpy_compositor.blend_region(canvas, np.asarray(overlay), pos, blend_mode)
+                result = numpy_compositor.to_image(canvas)
+        # Each step makes a new image, so keeping a reference is free.
+        if prefix_cache is not None:
+            prefix_cache.append((layer, result))
+
+    return result
+
+
+# Per-thread prefix caches; each worker thread or process keeps its own.
+_thread_local = threading.local()
+
+# Seconds spent in each stage of rendering, summed across worker threads.
+_render_times = {"composite": 0.0, "encode": 0.0, "write": 0.0}
+_render_times_lock = threading.Lock()
+
+
+def _record_times(**seconds: float) -> None:
+    with _render_times_lock:
+        for stage, value in seconds.items():
+            _render_times[stage] += value
+
+
+def _take_render_times() -> dict[str, float]:
+    """Return the accumulated stage times and reset them to zero."""
+    with _render_times_lock:
+        times = dict(_render_times)
+        for stage in _render_times:
+            _render_times[stage] = 0.0
+    return times
+
+
+def _merge_times(total: dict[str, float], other: dict[str, float]) -> dict[str, float]:
+    return {stage: total.get(stage, 0.0) + value for stage, value in other.items()}
+
+
+def _get_prefix_cache() -> list:
+    if not hasattr(_thread_local, "prefix_cache"):
+        _thread_local.prefix_cache = []
+    return _thread_local.prefix_cache
 
-    for layer in combination[1:]:
-        if not layer["path"]:
+
+def process_combination(
+    idx: int,
+    combination: tuple[dict, ...],
+    base_img: Image.Image,
+    output_template: str,
+    output_folder: Path,
+    manifest: dict[str, str] | None = None,
+    render_options: dict | None = None,
+) -> tuple[str, str | None, bool]:
+    """
+    Composite a layer combination and save the result to disk.
+
+    If a manifest is given and it already records the same input digest for
+    this output file, and the file still exists, rendering is skipped. The
+    digest is only computed when a manifest is given, and is None otherwise.
+    render_options carries the mixer's rendering settings ('compositor',
+    'prefix_cache' and the PNG encoder options under 'png'). Indices listed in
+    render_options['duplicates'] are not rendered; their files are linked or
+    copied from an identical output once rendering has finished.
+
+    Returns:
+        (output path, input digest, whether the image was rendered)
+    """
+    output_path = output_folder / _format_filename(output_template, idx, combination)
+    key = output_path.as_posix()
+    render_options = render_options or {}
+    png_options = render_options.get("png", png_encoder.DEFAULT_OPTIONS)
+    # Encoder settings change the output bytes, so they are part of the digest.
+    # Hashing every input file is wasted work when nothing records the result.
+    digest = None
+    if manifest is not None:
+        digest = output_manifest.combination_digest(combination, png_options)
+    if idx in render_options.get("duplicates", ()):
+        return key, digest, False
+    if manifest is not None and manifest.get(key) == digest and output_path.is_file():
+        return key, digest, False
+
+    started = time.perf_counter()
+    result = composite_layers(
+        combination,
+        base_img,
+        render_options.get("compositor", "pillow"),
+        _get_prefix_cache() if render_options.get("prefix_cache") else None,
+    )
+    composited = time.perf_counter()
+    data = png_encoder.encode(result, output_path, png_options)
+    encoded = time.perf_counter()
+    # The old file may be hardlinked to a duplicate output, which must not change.
+    output_path.unlink(missing_ok=True)
+    output_path.write_bytes(data)
+    _record_times(
+        composite=composited - started,
+        encode=encoded - composited,
+        write=time.perf_counter() - encoded,
+    )
+    return key, digest, True
+
+
+def render_tile(
+    idx: int,
+    combination: tuple[dict, ...],
+    base_img: Image.Image,
+    output_template: str,
+    output_folder: Path,
+    manifest: dict[str, str] | None = None,
+    render_options: dict | None = None,
+) -> tuple[int, str, Image.Image]:
+    """
+    Composite a layer combination for an atlas and return it instead of saving it.
+
+    Takes the same arguments as process_combination so the executors can run
+    either. Atlas tiles are always rendered, so the manifest is ignored.
+
+    Returns:
+        (combination index, formatted filename, composited image)
+    """
+    render_options = render_options or {}
+    started = time.perf_counter()
+    result = composite_layers(
+        combination,
+        base_img,
+        render_options.get("compositor", "pillow"),
+        _get_prefix_cache() if render_options.get("prefix_cache") else None,
+    )
+    _record_times(composite=time.perf_counter() - started)
+    return idx, _format_filename(output_template, idx, combination), result
+
+
+def _find_duplicates(
+    all_layers: list[list[dict]],
+    combination_mode: str,
+    indices: range,
+    output_template: str,
+    output_folder: Path,
+    png_options: dict,
+) -> dict[int, tuple[Path, Path, str]]:
+    """
+    Find combinations that would produce exactly the same file as an earlier one.
+
+    Combinations are keyed by their input digest (layer file contents, resolved
+    layer properties and encoder settings), the same key the manifest uses.
+    Combinations are walked lazily, but one output path is kept per distinct
+    digest, so memory grows with the number of distinct images even in
+    streaming mode.
+
+    Returns:
+        dict mapping each duplicate's index to (its output path, the output path
+        of the first combination with the same digest, the digest)
+    """
+    first: dict[str, Path] = {}
+    duplicates = {}
+    for idx, combination in zip(indices, iter_combinations(all_layers, combination_mode, indices)):
+        digest = output_manifest.combination_digest(combination, png_options)
+        output_path = output_folder / _format_filename(output_template, idx, combination)
+        source = first.setdefault(digest, output_path)
+        if source != output_path:
+            duplicates[idx] = (output_path, source, digest)
+    return duplicates
+
+
+def _write_duplicates(
+    duplicates: dict[int, tuple[Path, Path, str]],
+    manifest: dict[str, str] | None,
+    method: str,
+) -> dict[str, int]:
+    """
+    Create the files of duplicate combinations from their already rendered twins.
+
+    With method 'hardlink', falls back to a copy where the filesystem does not
+    support links. Duplicates the manifest shows as unchanged are left alone.
+
+    Returns:
+        counts of 'linked', 'copied' and 'unchanged' files
+    """
+    counts = {"linked": 0, "copied": 0, "unchanged": 0}
+    for output_path, source, digest in duplicates.values():
+        key = output_path.as_posix()
+        if manifest is not None and manifest.get(key) == digest and output_path.is_file():
+            counts["unchanged"] += 1
             continue
 
-        resample = _get_resample(layer.get("resample"))
+        output_path.unlink(missing_ok=True)
+        if method == "hardlink":
+            try:
+                os.link(source, output_path)
+                counts["linked"] += 1
+                continue
+            except OSError:
+                pass
+        shutil.copyfile(source, output_path)
+        counts["copied"] += 1
+    return counts
+
+
+def _layer_paths(all_layers: list[list[dict]]) -> set[Path]:
+    """Return every distinct image path referenced by the overlay layers."""
+    return {
+        variant["path"]
+        for layer_variants in all_layers[1:]
+        for variant in layer_variants
+        if variant["path"]
+    }
+
 
-        # Slot bbox from a template: position and size come directly from the bbox.
-        # Fallback: use the manually specified scale / anchor / offset.
-        if slot_bbox := layer.get("slot_bbox"):
-            x_min, y_min, x_max, y_max = slot_bbox
-            slot_w = x_max - x_min + 1
-            slot_h = y_max - y_min + 1
-            overlay = image_cache.get(layer["path"]).resize(
-                (slot_w, slot_h), resample=resample
+def _submit_bounded(
+    executor: concurrent.futures.Executor,
+    fn: Callable,
+    tasks: Iterable[tuple],
+    max_in_flight: int,
+    on_result: Callable,
+) -> None:
+    """
+    Submit fn(*task) for each task, never keeping more than max_in_flight pending.
+
+    Tasks are pulled from the iterable only as earlier ones complete, so memory
+    use stays constant however many tasks there are. on_result is called in the
+    submitting thread with each result, in completion order.
+    """
+    pending = set()
+    for task in tasks:
+        if len(pending) >= max_in_flight:
+            done, pending = concurrent.futures.wait(
+                pending, return_when=concurrent.futures.FIRST_COMPLETED
             )
-            pos = (x_min, y_min)
-        else:
-            overlay = _scale_image(
-                image_cache.get(layer["path"]), layer.get("scale"), resample
+            for future in done:
+                on_result(future.result())
+        pending.add(executor.submit(fn, *task))
+    for future in concurrent.futures.as_completed(pending):
+        on_result(future.result())
+
+
+def _run_thread_pool(
+    all_layers: list[list[dict]],
+    combination_mode: str,
+    indices: range,
+    base_img: Image.Image,
+    output_template: str,
+    output_folder: Path,
+    workers: int | None,
+    manifest: dict[str, str] | None,
+    render_options: dict,
+    max_in_flight: int | None,
+    on_result: Callable[[tuple], None],
+    task: Callable = process_combination,
+) -> tuple[dict[str, int], dict[str, float]]:
+    """
+    Render the combinations at the given indices on a thread pool and return
+    the image cache counters and the time spent in each rendering stage.
+
+    task is process_combination, or render_tile in atlas mode. With
+    max_in_flight set (streaming mode), combinations are fed through a
+    bounded window instead of all being queued up front.
+    """
+    combinations = zip(indices, iter_combinations(all_layers, combination_mode, indices))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        if max_in_flight:
+            tasks = (
+                (idx, combo, base_img, output_template, output_folder, manifest, render_options)
+                for idx, combo in combinations
             )
-            pos = _get_paste_position(
-                layer.get("anchor", "center"),
-                result.size,
-                overlay.size,
-                tuple(layer.get("offset", [0, 0])),
+            _submit_bounded(executor, task, tasks, max_in_flight, on_result)
+            return image_cache.stats(), _take_render_times()
+
+        futures = [
+            executor.submit(
+                task,
+                idx,
+                combo,
+                base_img,
+                output_template,
+                output_folder,
+                manifest,
+                render_options,
             )
+            for idx, combo in combinations
+        ]
+        for future in concurrent.futures.as_completed(futures):
+            on_result(future.result())  # Surface any exceptions from worker threads
+    return image_cache.stats(), _take_render_times()
 
-        temp = Image.new("RGBA", result.size, (0, 0, 0, 0))
-        temp.paste(overlay, pos, overlay)
-        result = Image.alpha_composite(result, temp)
 
-    return result
+# -------------------------------------------------------------------------------------- #
+# Process-pool engine
+#
+# Compositing is CPU-bound Pillow work, so threads only scale as far as Pillow releases
+# the GIL. The process engine ships the expanded layers, the base image and the image
+# cache to each worker once, then hands out contiguous chunks of combination indices.
+# -------------------------------------------------------------------------------------- #
 
+# Per-process state installed by _init_worker, read by _process_chunk.
+_worker_state: dict = {}
 
-def process_combination(
-    idx: int,
-    combination: tuple[dict, ...],
+
+def _init_worker(
+    all_layers: list[list[dict]],
+    combination_mode: str,
     base_img: Image.Image,
     output_template: str,
     output_folder: Path,
+    manifest: dict[str, str] | None,
+    render_options: dict,
+    cache_settings: dict,
+    cached_images: dict[Path, Image.Image],
+    task: Callable,
 ) -> None:
-    """Composite a layer combination and save the result to disk."""
-    result = composite_layers(combination, base_img)
-    filename = _format_filename(output_template, idx, combination)
-    result.save(output_folder / filename)
+    image_cache.configure(**cache_settings)
+    image_cache.seed(cached_images)
+    _worker_state.update(
+        all_layers=all_layers,
+        combination_mode=combination_mode,
+        base_img=base_img,
+        output_template=output_template,
+        output_folder=output_folder,
+        manifest=manifest,
+        render_options=render_options,
+        task=task,
+    )
+
+
+def _process_chunk(
+    start: int, stop: int
+) -> tuple[list[tuple], dict[str, int], dict[str, float]]:
+    """
+    Render combinations [start, stop) inside a worker process.
+
+    Returns the per-combination results and the worker's image cache counters
+    and stage times for this chunk, so the parent can report totals across all
+    workers.
+    """
+    state = _worker_state
+    results = []
+    for idx in range(start, stop):
+        combination = combination_at(state["all_layers"], state["combination_mode"], idx)
+        results.append(
+            state["task"](
+                idx,
+                combination,
+                state["base_img"],
+                state["output_template"],
+                state["output_folder"],
+                state["manifest"],
+                state["render_options"],
+            )
+        )
+    cache_stats = image_cache.stats()
+    image_cache.reset_stats()
+    return results, cache_stats, _take_render_times()
+
+
+def _run_process_pool(
+    all_layers: list[list[dict]],
+    combination_mode: str,
+    indices: range,
+    base_img: Image.Image,
+    output_template: str,
+    output_folder: Path,
+    workers: int | None,
+    chunk_size: int,
+    manifest: dict[str, str] | None,
+    render_options: dict,
+    cache_settings: dict,
+    max_in_flight: int | None,
+    on_result: Callable[[tuple], None],
+    task: Callable = process_combination,
+) -> tuple[dict[str, int], dict[str, float]]:
+    """
+    Render the combinations at the given indices on a process pool and return
+    the merged image cache counters and stage times of all workers.
+
+    With max_in_flight set (streaming mode), at most that many chunks are queued
+    at once; otherwise every chunk is submitted up front.
+    """
+    # Decode every overlay once in the parent so workers start with a warm cache.
+    cached_images = image_cache.snapshot(_layer_paths(all_layers))
+
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(
+            all_layers,
+            combination_mode,
+            base_img,
+            output_template,
+            output_folder,
+            manifest,
+            render_options,
+            cache_settings,
+            cached_images,
+            task,
+        ),
+    ) as executor:
+        cache_stats = image_cache.stats()
+        render_times = _take_render_times()
+
+        def on_chunk(chunk: tuple) -> None:
+            nonlocal cache_stats, render_times
+            chunk_results, chunk_stats, chunk_times = chunk
+            for result in chunk_results:
+                on_result(result)
+            cache_stats = image_cache.merge_stats(cache_stats, chunk_stats)
+            render_times = _merge_times(render_times, chunk_times)
+
+        chunks = (
+            (start, min(start + chunk_size, indices.stop))
+            for start in range(indices.start, indices.stop, chunk_size)
+        )
+        # Submitting everything at once is the same as an unbounded window.
+        _submit_bounded(
+            executor, _process_chunk, chunks, max_in_flight or len(indices), on_chunk
+        )
+    return cache_stats, render_times
 
 
 # -------------------------------------------------------------------------------------- #
@@ -364,7 +960,176 @@ def process_combination(
 # -------------------------------------------------------------------------------------- #
 
 
-def generate_images(image_mixer: dict, large_batch_threshold: int = 500) -> None:
+def _peak_rss_bytes() -> int | None:
+    """
+    Return the peak resident memory of this process and of its largest finished
+    child process, or None where the platform does not report it.
+    """
+    if resource is None:
+        return None
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere.
+    unit = 1 if sys.platform == "darwin" else 1024
+    return unit * max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+
+
+def _hit_rate(hits: int, misses: int) -> float | None:
+    return hits / (hits + misses) if hits + misses else None
+
+
+def _write_report(
+    output_folder: Path,
+    phases: dict[str, float],
+    render_times: dict[str, float],
+    cache_stats: dict[str, int],
+    counts: dict[str, int],
+    settings: dict,
+) -> Path:
+    """Write a mixer's profiling report as JSON into its output folder."""
+    render_seconds = phases["render"]
+    report = {
+        "output_folder": output_folder.as_posix(),
+        "settings": settings,
+        **counts,
+        "phases": phases,
+        "render_times": render_times,
+        "images_per_second": (
+            counts["rendered"] / render_seconds if render_seconds else None
+        ),
+        "cache": {
+            **cache_stats,
+            "hit_rate": _hit_rate(cache_stats["hits"], cache_stats["misses"]),
+            "resized_hit_rate": _hit_rate(
+                cache_stats["resized_hits"], cache_stats["resized_misses"]
+            ),
+        },
+        "peak_rss_bytes": _peak_rss_bytes(),
+    }
+    report_path = output_folder / REPORT_FILENAME
+    with report_path.open("w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    return report_path
+
+
+def _plan_mixer(
+    all_layers: list[list[dict]],
+    combination_mode: str,
+    indices: range,
+    base_img: Image.Image,
+    output_template: str,
+    output_folder: Path,
+    render_options: dict,
+    cache_settings: dict,
+    workers: int | None,
+    executor_kind: str,
+    dedupe: str | bool,
+    samples: int,
+) -> dict:
+    """
+    Estimate what rendering the given combinations would cost, without writing anything.
+
+    Memory comes from image headers: decoded sources at 4 bytes per pixel, plus
+    one resized copy per distinct (file, target size), capped by the cache
+    limits. Output size and render time are extrapolated from composing and
+    encoding up to 'samples' combinations spread evenly over the range, in
+    memory. Samples are rendered without the prefix cache and their median
+    time is used, so the projection leans high rather than low. Only the
+    process executor is assumed to spread that time over several cores; the
+    thread executor counts as THREAD_PARALLELISM cores. File writes are not
+    included, and hardlinked duplicates add no output bytes.
+    """
+    paths = _layer_paths(all_layers) | {
+        variant["path"] for variant in all_layers[0] if variant["path"]
+    }
+    decoded_bytes = sum(w * h * 4 for w, h in map(image_cache.size, paths))
+    if "max_bytes" in cache_settings:
+        decoded_bytes = min(decoded_bytes, cache_settings["max_bytes"])
+
+    resized_sizes = set()
+    for layer_variants in all_layers[1:]:
+        for variant in layer_variants:
+            if not variant["path"]:
+                continue
+            source_size = image_cache.size(variant["path"])
+            if slot_bbox := variant.get("slot_bbox"):
+                x_min, y_min, x_max, y_max = slot_bbox
+                size = (x_max - x_min + 1, y_max - y_min + 1)
+            else:
+                size = _scaled_size(source_size, variant.get("scale"))
+            if size != source_size:
+                resized_sizes.add((variant["path"], size))
+    resized_bytes = min(
+        sum(w * h * 4 for _, (w, h) in resized_sizes),
+        cache_settings.get("resized_max_bytes", image_cache.DEFAULT_RESIZED_MAX_BYTES),
+    )
+
+    renders = len(indices)
+    duplicates = 0
+    if dedupe:
+        duplicates = len(
+            _find_duplicates(
+                all_layers,
+                combination_mode,
+                indices,
+                output_template,
+                output_folder,
+                render_options["png"],
+            )
+        )
+        renders -= duplicates
+
+    # Evenly spaced positions, always including the first and last combination.
+    count = min(samples, len(indices))
+    positions = sorted({round(i * (len(indices) - 1) / max(count - 1, 1)) for i in range(count)})
+    seconds = []
+    encoded_bytes = []
+    for position in positions:
+        idx = indices[position]
+        combination = combination_at(all_layers, combination_mode, idx)
+        output_path = output_folder / _format_filename(output_template, idx, combination)
+        started = time.perf_counter()
+        result = composite_layers(combination, base_img, render_options["compositor"])
+        data = png_encoder.encode(result, output_path, render_options["png"])
+        seconds.append(time.perf_counter() - started)
+        encoded_bytes.append(len(data))
+
+    # CPU-bound work does not scale past the core count, whatever the worker
+    # count, and threads are held back by the GIL long before that.
+    cores = os.cpu_count() or 1
+    if executor_kind == "process":
+        parallelism = min(workers or cores, cores)
+    else:
+        parallelism = THREAD_PARALLELISM
+    seconds_per_image = sorted(seconds)[len(seconds) // 2] if seconds else 0.0
+    outputs = renders if dedupe == "hardlink" else len(indices)
+    return {
+        "combinations": len(indices),
+        "renders": renders,
+        "duplicates": duplicates,
+        "layer_files": len(paths),
+        # The scaled base image is held for the whole run on top of the cache.
+        "decoded_bytes": decoded_bytes + base_img.width * base_img.height * 4,
+        "resized_bytes": resized_bytes,
+        "output_bytes": round(sum(encoded_bytes) / len(encoded_bytes) * outputs),
+        "samples": len(positions),
+        "seconds_per_image": seconds_per_image,
+        "parallelism": parallelism,
+        "projected_seconds": seconds_per_image * renders / parallelism,
+    }
+
+
+def generate_images(
+    image_mixer: dict,
+    large_batch_threshold: int = 500,
+    shard: tuple[int, int] | None = None,
+    index_range: tuple[int, int] | None = None,
+    fast_encode: bool = False,
+    profile: bool = False,
+    plan: bool = False,
+    plan_samples: int = PLAN_SAMPLES,
+) -> dict | None:
     """
     Generate and save all composite images for a given image_mixer config.
 
@@ -375,11 +1140,49 @@ def generate_images(image_mixer: dict, large_batch_threshold: int = 500) -> None
             - combination_mode (str): 'cartesian' or 'zip'. Defaults to 'cartesian'.
             - layers (list): Layer definitions.
             - slot_template (str, optional): Path to a slot template PNG.
+            - executor (str): 'thread' or 'process'. Defaults to 'thread'.
+            - workers (int, optional): Worker count. Defaults to the executor's own default.
+            - chunk_size (int): Combinations per task for the process executor. Defaults to 64.
+            - streaming (bool): Generate combinations lazily and keep at most
+              'max_in_flight' tasks queued. Turns off 'incremental'. Defaults to False.
+            - incremental (bool): Skip outputs whose inputs are unchanged since the
+              last run, tracked in data/image_mixer/manifest.json. Defaults to True,
+              except in streaming mode.
+            - compositor (str): 'pillow' or 'numpy'. Defaults to 'pillow'.
+            - prefix_cache (bool): Reuse composites of shared leading layers between
+              consecutive combinations. Defaults to True in cartesian mode.
+            - cache (dict, optional): Image cache limits. 'max_mb' caps decoded
+              images (default unbounded), 'overlay_mb' caps the resized-overlay
+              tier (default 64), and 'scope' set to 'mixer' empties the cache
+              once the mixer finishes (default 'process').
+            - png (dict, optional): PNG encoder settings: 'compress_level' (0-9,
+              default 6), 'optimize' (default False), 'quantize' (default False)
+              with 'quantize_max_size' (default 128), and 'fast' (default False).
+            - preload (bool): Decode every overlay in parallel before compositing
+              starts. Skipped on incremental rebuilds with the thread executor.
+              Defaults to True.
+            - dedupe (bool | str): Render identical combinations once and hardlink
+              ('hardlink' or True) or copy ('copy') the result to the other outputs.
+              Defaults to 'hardlink' in zip mode and False in cartesian mode.
+            - atlas (bool | dict, optional): Pack every image into atlas pages with
+              a JSON index instead of writing one file each. Accepts 'name'
+              (default 'atlas'), 'max_size' (default 2048) and 'padding' (default 0).
+            - profile (bool): Time each phase and write image_mixer_report.json
+              into the output folder. Defaults to False.
         large_batch_threshold: Print a warning if this many images would be generated.
             Set to 0 to disable. Defaults to 500.
+        shard: Optional (k, n) to render only the k-th of n shards (1-based).
+        index_range: Optional (start, stop) combination index range to render.
+            Output filenames, including {index}, match a full single-job run.
+        fast_encode: Use the fast PNG settings for every mixer, e.g. for dev builds.
+        profile: Profile every mixer, as if each had 'profile' set.
+        plan: Only estimate the cost of the mixer (see _plan_mixer) and return it,
+            rendering plan_samples combinations in memory. Nothing is written.
+
+    Returns:
+        The cost estimate in plan mode, otherwise None.
     """
     output_folder = Path(image_mixer["output_folder"])
-    output_folder.mkdir(parents=True, exist_ok=True)
 
     output_template = image_mixer.get("output_template", "image_{index}.png")
     combination_mode = image_mixer.get("combination_mode", "cartesian")
@@ -389,24 +1192,101 @@ def generate_images(image_mixer: dict, large_batch_threshold: int = 500) -> None
             f"Invalid combination_mode '{combination_mode}'. Must be 'cartesian' or 'zip'."
         )
 
+    executor_kind = image_mixer.get("executor", "thread")
+    if executor_kind not in EXECUTORS:
+        raise ValueError(
+            f"Invalid executor '{executor_kind}'. Must be 'thread' or 'process'."
+        )
+    workers = image_mixer.get("workers")
+    chunk_size = max(1, int(image_mixer.get("chunk_size", DEFAULT_CHUNK_SIZE)))
+
+    # Streaming mode pulls combinations lazily and caps how many tasks are queued.
+    # For the process executor the window counts chunks rather than combinations.
+    streaming = image_mixer.get("streaming", False)
+    max_in_flight = None
+    if streaming:
+        max_in_flight = max(
+            1,
+            int(
+                image_mixer.get(
+                    "max_in_flight",
+                    (workers or os.cpu_count() or 1) * IN_FLIGHT_PER_WORKER,
+                )
+            ),
+        )
+
+    compositor = image_mixer.get("compositor", "pillow")
+    if compositor not in COMPOSITORS:
+        raise ValueError(
+            f"Invalid compositor '{compositor}'. Must be 'pillow' or 'numpy'."
+        )
+    # Cartesian combinations come out in product order, so neighbours share
+    # long layer prefixes. Zip combinations rarely do.
+    prefix_cache = image_mixer.get("prefix_cache", combination_mode == "cartesian")
+    render_options = {
+        "compositor": compositor,
+        "prefix_cache": prefix_cache,
+        "png": png_encoder.resolve_options(image_mixer.get("png"), fast_encode),
+    }
+
+    # Zip mixers often resolve several recipes to identical layers (e.g. colour
+    # variants sharing textures), which only need rendering once.
+    dedupe = image_mixer.get("dedupe", "hardlink" if combination_mode == "zip" else False)
+    if dedupe is True:
+        dedupe = "hardlink"
+    if dedupe and dedupe not in DEDUPE_METHODS:
+        raise ValueError(
+            f"Invalid dedupe '{dedupe}'. Must be true, false, 'hardlink' or 'copy'."
+        )
+
+    # Atlas tiles are handed back to this thread to be packed, so they always go
+    # through a bounded window to keep only a few unpacked tiles alive at once.
+    atlas_config = image_mixer.get("atlas", False)
+    if atlas_config is True:
+        atlas_config = {}
+    elif atlas_config is False:
+        atlas_config = None
+    if atlas_config is not None and max_in_flight is None:
+        max_in_flight = (workers or os.cpu_count() or 1) * IN_FLIGHT_PER_WORKER
+
+    cache_config = image_mixer.get("cache", {})
+    cache_scope = cache_config.get("scope", "process")
+    if cache_scope not in CACHE_SCOPES:
+        raise ValueError(
+            f"Invalid cache scope '{cache_scope}'. Must be 'process' or 'mixer'."
+        )
+    cache_settings = {}
+    if "max_mb" in cache_config:
+        cache_settings["max_bytes"] = int(cache_config["max_mb"] * MIB)
+    if "overlay_mb" in cache_config:
+        cache_settings["resized_max_bytes"] = int(cache_config["overlay_mb"] * MIB)
+    image_cache.configure(**cache_settings)
+
     # Build the variable map for this mixer, filtered by the whitelists.
     # Done per-mixer so different mixers can target different recipe subsets
     # (e.g. one mixer for furnace-only, another for smoker-only).
+    profile = profile or image_mixer.get("profile", False)
+    phases: dict[str, float] = {}
+    started = time.perf_counter()
+
     recipe_gen = image_mixer.get("recipe_generation", {})
     id_whitelist = recipe_gen.get("id_whitelist") or None
     tag_whitelist = recipe_gen.get("tag_whitelist") or None
     variable_map = _build_variable_map(id_whitelist, tag_whitelist)
+    phases["variable_map"] = time.perf_counter() - started
 
     # Read slot template if provided and inject slot_bbox into each layer config.
     # Layers are matched to slots by their position in the array, skipping layer 0
     # (the base). Layer 1 → slot 0, layer 2 → slot 1, etc.
     # The template must be the same pixel dimensions as the scaled output canvas.
+    started = time.perf_counter()
     layers = image_mixer["layers"]
     if template_path := image_mixer.get("slot_template"):
-        slot_bboxes = read_slot_template(template_path)
+        slot_bboxes = read_slot_template(template_path, len(layers) - 1)
         for layer_index, layer in enumerate(layers[1:], start=0):
             if layer_index in slot_bboxes:
                 layer["slot_bbox"] = slot_bboxes[layer_index]
+    phases["slot_template"] = time.perf_counter() - started
 
     # Load and scale the base image once — shared across all combinations.
     base_layer_config = layers[0]
@@ -416,8 +1296,10 @@ def generate_images(image_mixer: dict, large_batch_threshold: int = 500) -> None
         _get_resample(base_layer_config.get("resample")),
     )
 
-    combinations = generate_combinations(layers, combination_mode, variable_map)
-    total = len(combinations)
+    started = time.perf_counter()
+    all_layers = expand_layers(layers, variable_map)
+    total = combination_count(all_layers, combination_mode)
+    phases["expand_layers"] = time.perf_counter() - started
 
     if total == 0:
         print(
@@ -425,36 +1307,346 @@ def generate_images(image_mixer: dict, large_batch_threshold: int = 500) -> None
         )
         return
 
-    if large_batch_threshold and total > large_batch_threshold:
+    indices = shard_range(total, shard, index_range)
+    if not indices:
+        print(f"[INFO] No combinations of {total} fall in this shard.")
+        return
+    if len(indices) != total:
         print(
-            f"[WARNING] About to generate {total} images. This may heavily load your system."
+            f"[INFO] Rendering combinations {indices.start}-{indices.stop - 1} of {total}."
         )
 
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        futures = [
-            executor.submit(
-                process_combination,
-                idx,
-                combo,
-                base_img,
-                output_template,
-                output_folder,
-            )
-            for idx, combo in enumerate(combinations)
-        ]
-        for future in concurrent.futures.as_completed(futures):
-            future.result()  # Surface any exceptions from worker threads
+    if plan:
+        return _plan_mixer(
+            all_layers,
+            combination_mode,
+            indices,
+            base_img,
+            output_template,
+            output_folder,
+            render_options,
+            cache_settings,
+            workers,
+            executor_kind,
+            dedupe if atlas_config is None else False,
+            plan_samples,
+        )
+
+    if large_batch_threshold and len(indices) > large_batch_threshold:
+        print(
+            f"[WARNING] About to generate {len(indices)} images. This may heavily load your system."
+        )
+
+    output_folder.mkdir(parents=True, exist_ok=True)
+
+    # Outputs whose recorded input digest is unchanged are skipped, so a no-op
+    # rebuild only hashes inputs and checks that the files are still there.
+    # Atlas pages are rebuilt every run. The manifest holds an entry for every
+    # combination (and is pickled into every worker process), so streaming mode,
+    # whose point is flat memory, does not use it.
+    incremental = image_mixer.get("incremental", True) and atlas_config is None
+    if incremental and streaming:
+        if "incremental" in image_mixer:
+            print("[INFO] Streaming mode does not track outputs in the manifest; every image is rendered.")
+        incremental = False
+    previous = None
+    if incremental:
+        manifest_key = output_manifest.mixer_key(output_folder, output_template)
+        previous = output_manifest.load(manifest_key)
+
+    image_cache.reset_stats()
+    _take_render_times()
+
+    # Decode every overlay up front, in parallel, so compositing never waits on
+    # file IO. An incremental rebuild usually skips most outputs, so decoding
+    # everything would only slow it down; the process executor decodes every
+    # overlay for its workers anyway.
+    if image_mixer.get("preload", True) and (executor_kind == "process" or not previous):
+        started = time.perf_counter()
+        image_cache.preload(_layer_paths(all_layers), workers)
+        phases["preload"] = time.perf_counter() - started
+
+    # Duplicates are skipped by the workers and filled in from their twin's file
+    # afterwards. Atlas pages need every tile, so atlas mixers do not dedupe.
+    duplicates = {}
+    task_options = render_options
+    if dedupe and atlas_config is None:
+        duplicates = _find_duplicates(
+            all_layers,
+            combination_mode,
+            indices,
+            output_template,
+            output_folder,
+            render_options["png"],
+        )
+        task_options = {**render_options, "duplicates": set(duplicates)}
+    duplicate_keys = {output_path.as_posix() for output_path, _, _ in duplicates.values()}
+
+    # Results are folded in as they arrive rather than collected into a list.
+    # Only incremental mixers keep anything per combination, and streaming mode
+    # turns that off, so there memory stays flat however many combinations there
+    # are, apart from deduplication (see _find_duplicates).
+    new_outputs: dict[str, str] = {}
+    skipped = 0
+
+    def on_result(result: tuple[str, str, bool]) -> None:
+        nonlocal skipped
+        key, digest, rendered = result
+        if incremental:
+            new_outputs[key] = digest
+        if not rendered and key not in duplicate_keys:
+            skipped += 1
+
+    task = process_combination
+    atlas_writer = None
+    if atlas_config is not None:
+        atlas_name = atlas_config.get("name", atlas.DEFAULT_NAME)
+        if len(indices) != total:
+            # Keep the pages of different shards from overwriting each other.
+            atlas_name += f"_{indices.start}-{indices.stop - 1}"
+        atlas_writer = atlas.AtlasWriter(
+            output_folder,
+            atlas_name,
+            base_img.size,
+            len(indices),
+            max_size=int(atlas_config.get("max_size", atlas.DEFAULT_MAX_SIZE)),
+            padding=int(atlas_config.get("padding", 0)),
+            png_options=render_options["png"],
+        )
+        task = render_tile
+
+        def on_result(result: tuple[int, str, Image.Image]) -> None:
+            idx, tile_name, tile = result
+            atlas_writer.add(idx - indices.start, tile_name, tile)
+
+    started = time.perf_counter()
+    if executor_kind == "process":
+        cache_stats, render_times = _run_process_pool(
+            all_layers,
+            combination_mode,
+            indices,
+            base_img,
+            output_template,
+            output_folder,
+            workers,
+            chunk_size,
+            previous,
+            task_options,
+            cache_settings,
+            max_in_flight,
+            on_result,
+            task,
+        )
+    else:
+        cache_stats, render_times = _run_thread_pool(
+            all_layers,
+            combination_mode,
+            indices,
+            base_img,
+            output_template,
+            output_folder,
+            workers,
+            previous,
+            task_options,
+            max_in_flight,
+            on_result,
+            task,
+        )
+    if duplicates:
+        written = _write_duplicates(duplicates, previous, dedupe)
+        print(
+            f"[INFO] Deduplicated {len(duplicates)} of {len(indices)} images: "
+            f"{written['linked']} hardlinked, {written['copied']} copied, "
+            f"{written['unchanged']} unchanged."
+        )
+    if atlas_writer is not None:
+        index_path = atlas_writer.close()
+        render_times["encode"] += atlas_writer.encode_seconds
+        render_times["write"] += atlas_writer.write_seconds
+        print(
+            f"[INFO] Packed {len(indices)} images into {atlas_writer.page_count} atlas "
+            f"page(s), index written to '{index_path}'."
+        )
+    phases["render"] = time.perf_counter() - started
+
+    if skipped:
+        print(f"[INFO] Skipped {skipped} of {len(indices)} unchanged images.")
+    print(
+        f"[INFO] Image cache: {cache_stats['resized_hits']} resized hits, "
+        f"{cache_stats['resized_misses']} resized misses, "
+        f"{cache_stats['evictions']} evictions, "
+        f"peak {cache_stats['peak_bytes'] / MIB:.1f} MiB."
+    )
+    # Summed over workers, so with several workers these exceed the wall time.
+    print(
+        f"[INFO] Render time: composite {render_times['composite']:.2f}s, "
+        f"encode {render_times['encode']:.2f}s, write {render_times['write']:.2f}s."
+    )
+
+    if profile:
+        rendered = len(indices) - skipped - len(duplicates)
+        report_path = _write_report(
+            output_folder,
+            phases,
+            render_times,
+            cache_stats,
+            {
+                "combinations": total,
+                "rendered": rendered,
+                "skipped": skipped,
+                "deduplicated": len(duplicates),
+            },
+            {
+                "executor": executor_kind,
+                "workers": workers,
+                "streaming": max_in_flight is not None,
+                **render_options,
+            },
+        )
+        rss = _peak_rss_bytes()
+        print(
+            f"[INFO] Profile: variable map {phases['variable_map']:.2f}s, "
+            f"slot template {phases['slot_template']:.2f}s, "
+            f"layer expansion {phases['expand_layers']:.2f}s, "
+            f"render {phases['render']:.2f}s "
+            f"({rendered / phases['render'] if phases['render'] else 0:.1f} images/s)"
+            + (f", peak RSS {rss / MIB:.0f} MiB" if rss is not None else "")
+            + f". Report written to '{report_path}'."
+        )
+
+    if cache_scope == "mixer":
+        image_cache.clear()
+
+    if incremental:
+        # Drop this mixer's entries that were not produced this run, so outputs
+        # that are no longer generated do not stay in the manifest forever. A
+        # shard only produces part of the mixer, so it keeps the entries of the
+        # other shards whose files still exist. Other mixers' sections, even for
+        # the same folder, are left alone.
+        outputs = {}
+        if len(indices) != total:
+            outputs = {
+                key: digest
+                for key, digest in output_manifest.load(manifest_key).items()
+                if Path(key).is_file()
+            }
+        outputs.update(new_outputs)
+        output_manifest.save(manifest_key, outputs)
+
+
+def _parse_args(argv: list[str]) -> dict:
+    """
+    Parse the filter's command-line arguments.
+
+    The first argument may be Regolith's JSON settings object. Both the settings
+    and the extra arguments accept a shard ('--shard 3/8', {"shard": "3/8"}), an
+    index range ('--range 0:1000', {"index_range": "0:1000"}), fast PNG
+    encoding ('--fast', {"fast": true}), profiling ('--profile', {"profile": true})
+    and plan mode ('--plan', {"plan": true}) with an optional limit on the
+    projected seconds ('--plan-limit 3600', {"plan_limit": 3600}).
+    """
+    settings = {}
+    if argv and argv[0].lstrip().startswith("{"):
+        settings = json.loads(argv[0])
+        argv = argv[1:]
+
+    args = iter(argv)
+    for arg in args:
+        if arg == "--shard":
+            settings["shard"] = next(args, "")
+        elif arg == "--range":
+            settings["index_range"] = next(args, "")
+        elif arg == "--fast":
+            settings["fast"] = True
+        elif arg == "--profile":
+            settings["profile"] = True
+        elif arg == "--plan":
+            settings["plan"] = True
+        elif arg == "--plan-limit":
+            settings["plan_limit"] = next(args, "")
+        else:
+            raise SystemExit(f"[ERROR] Unknown argument '{arg}'.")
+
+    parsed = {}
+    if shard := settings.get("shard"):
+        try:
+            k, n = (int(part) for part in str(shard).split("/"))
+        except ValueError:
+            raise SystemExit(f"[ERROR] Invalid shard '{shard}'. Expected K/N, e.g. 3/8.") from None
+        if not 1 <= k <= n:
+            raise SystemExit(f"[ERROR] Invalid shard '{shard}'. Expected 1 <= K <= N.")
+        parsed["shard"] = (k, n)
+    if index_range := settings.get("index_range"):
+        try:
+            start, stop = (int(part) for part in str(index_range).split(":"))
+        except ValueError:
+            raise SystemExit(
+                f"[ERROR] Invalid index range '{index_range}'. Expected START:STOP, e.g. 0:1000."
+            ) from None
+        parsed["index_range"] = (start, stop)
+    if settings.get("fast"):
+        parsed["fast_encode"] = True
+    if settings.get("profile"):
+        parsed["profile"] = True
+    if settings.get("plan"):
+        parsed["plan"] = True
+    if (plan_limit := settings.get("plan_limit")) not in (None, ""):
+        try:
+            parsed["plan_limit"] = float(plan_limit)
+        except ValueError:
+            raise SystemExit(
+                f"[ERROR] Invalid plan limit '{plan_limit}'. Expected a number of seconds."
+            ) from None
+    return parsed
+
+
+def _print_plan(name: str, plan: dict) -> None:
+    print(
+        f"[INFO] Plan for {name}: {plan['combinations']} images "
+        f"({plan['renders']} rendered, {plan['duplicates']} duplicates) "
+        f"from {plan['layer_files']} layer files, "
+        f"~{plan['decoded_bytes'] / MIB:.1f} MiB decoded + "
+        f"{plan['resized_bytes'] / MIB:.1f} MiB resized in memory, "
+        f"~{plan['output_bytes'] / MIB:.1f} MiB of output, "
+        f"~{plan['projected_seconds']:.1f}s projected "
+        f"({plan['seconds_per_image'] * 1000:.1f} ms/image over {plan['parallelism']} "
+        f"core(s), {plan['samples']} samples)."
+    )
 
 
 if __name__ == "__main__":
+    run_args = _parse_args(sys.argv[1:])
     mixers_dir = Path("data/image_mixer/mixers")
     mixer_files = sorted(mixers_dir.glob("*.json"))
 
     if not mixer_files:
         print(f"[WARNING] No mixer files found in '{mixers_dir}'.")
 
+    # Plan mode estimates every mixer without writing anything, not even the
+    # recipe parse cache.
+    plan_limit = run_args.pop("plan_limit", None)
+    if run_args.get("plan"):
+        rig.set_read_only()
+    totals = {"combinations": 0, "output_bytes": 0, "projected_seconds": 0.0}
+
     for mixer_path in mixer_files:
         with mixer_path.open("r") as f:
             image_mixer = json.load(f)
         print(f"[INFO] Running mixer: {mixer_path.name}")
-        generate_images(image_mixer)
+        plan = generate_images(image_mixer, **run_args)
+        if plan:
+            _print_plan(mixer_path.name, plan)
+            for key in totals:
+                totals[key] += plan[key]
+
+    if run_args.get("plan"):
+        print(
+            f"[INFO] Plan total: {totals['combinations']} images, "
+            f"~{totals['output_bytes'] / MIB:.1f} MiB of output, "
+            f"~{totals['projected_seconds']:.1f}s projected."
+        )
+        if plan_limit is not None and totals["projected_seconds"] > plan_limit:
+            raise SystemExit(
+                f"[ERROR] Projected render time {totals['projected_seconds']:.1f}s "
+                f"exceeds the plan limit of {plan_limit:g}s."
+            )
@@ -0,0 +1,86 @@
+import hashlib
+import json
+from functools import lru_cache
+from pathlib import Path
+
+MANIFEST_PATH = Path("data/image_mixer/manifest.json")
+
+# Bump when compositing output changes for identical inputs, so that every
+# manifest written by an older version is treated as stale.
+MANIFEST_VERSION = 2
+
+# Resolved layer properties that affect the rendered pixels.
+HASHED_PROPERTIES = ("offset", "anchor", "scale", "resample", "slot_bbox", "blend_mode")
+
+
+def mixer_key(output_folder: Path, output_template: str) -> str:
+    """
+    Return the manifest section of a mixer.
+
+    Mixers may share an output folder, so each one's entries are kept apart by
+    its folder and filename template.
+    """
+    return f"{output_folder.as_posix().rstrip('/')}/{output_template}"
+
+
+def _read(path: Path) -> dict[str, dict[str, str]]:
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if data.get("version") != MANIFEST_VERSION:
+        return {}
+    return data.get("mixers", {})
+
+
+def load(mixer: str, path: Path | None = None) -> dict[str, str]:
+    """
+    Load one mixer's section of the output manifest, mapping output file paths
+    to input digests.
+
+    Returns an empty section if the file is missing, unreadable, or was
+    written by a different MANIFEST_VERSION.
+    """
+    return _read(path or MANIFEST_PATH).get(mixer, {})
+
+
+def save(mixer: str, outputs: dict[str, str], path: Path | None = None) -> None:
+    """Replace one mixer's section of the output manifest, keeping the others."""
+    path = path or MANIFEST_PATH
+    mixers = _read(path)
+    mixers[mixer] = dict(sorted(outputs.items()))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8") as f:
+        json.dump(
+            {"version": MANIFEST_VERSION, "mixers": dict(sorted(mixers.items()))},
+            f,
+            indent=2,
+        )
+
+
+@lru_cache(maxsize=None)
+def file_digest(path: Path) -> str:
+    """Return the SHA-256 of a file's contents, computed once per process."""
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def combination_digest(combination: tuple[dict, ...], *extra: object) -> str:
+    """
+    Hash everything that determines the pixels of one output image.
+
+    Covers the contents of every layer file plus each layer's resolved
+    properties. Any additional values (e.g. encoder settings) can be passed
+    as extra arguments and are folded into the same digest.
+    """
+    parts = []
+    for layer in combination:
+        path = layer["path"]
+        parts.append(
+            {
+                "file": file_digest(Path(path)) if path else None,
+                **{key: layer.get(key) for key in HASHED_PROPERTIES},
+            }
+        )
+    payload = json.dumps([MANIFEST_VERSION, parts, list(extra)], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
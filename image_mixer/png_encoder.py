@@ -0,0 +1,82 @@
+import io
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+# Pillow's own PNG defaults.
+DEFAULT_OPTIONS = {
+    "compress_level": 6,
+    "optimize": False,
+    "quantize": False,
+    "quantize_max_size": 128,
+}
+
+# Dev builds: fastest zlib level that still compresses, no extra passes.
+FAST_OPTIONS = {"compress_level": 1, "optimize": False, "quantize": False}
+
+
+def resolve_options(config: dict | None = None, fast: bool = False) -> dict:
+    """
+    Merge a mixer's 'png' settings over the defaults.
+
+    'fast' (from the settings or the caller) overrides everything else, so a dev
+    build can be made quick without editing every mixer.
+
+    Raises:
+        ValueError: If compress_level is not between 0 and 9.
+    """
+    config = config or {}
+    options = {**DEFAULT_OPTIONS, **{k: v for k, v in config.items() if k != "fast"}}
+    if fast or config.get("fast", False):
+        options.update(FAST_OPTIONS)
+
+    if not 0 <= int(options["compress_level"]) <= 9:
+        raise ValueError(
+            f"Invalid compress_level '{options['compress_level']}'. Must be between 0 and 9."
+        )
+    options["compress_level"] = int(options["compress_level"])
+    options["quantize_max_size"] = int(options["quantize_max_size"])
+    return options
+
+
+def to_palette(img: Image.Image) -> tuple[Image.Image, bytes] | None:
+    """
+    Convert an RGBA image to palette mode without losing any pixel information.
+
+    Returns the palette image and its per-entry alpha values (for the PNG tRNS
+    chunk), or None if the image has more than 256 distinct colours.
+    """
+    pixels = np.ascontiguousarray(np.asarray(img, dtype=np.uint8))
+    packed = pixels.view(np.uint32).reshape(-1)
+    colors, indices = np.unique(packed, return_inverse=True)
+    if len(colors) > 256:
+        return None
+
+    palette = colors.view(np.uint8).reshape(-1, 4)
+    paletted = Image.frombytes("P", img.size, indices.astype(np.uint8).tobytes())
+    paletted.putpalette(palette[:, :3].tobytes())
+    return paletted, palette[:, 3].tobytes()
+
+
+def encode(img: Image.Image, output_path: Path, options: dict) -> bytes:
+    """
+    Encode an image in the format implied by output_path's extension.
+
+    PNG outputs use the given options. With 'quantize' enabled, images no larger
+    than 'quantize_max_size' on either side are written as palette PNGs when they
+    have at most 256 colours, which decodes to exactly the same RGBA pixels.
+    Other formats are saved with Pillow's defaults.
+    """
+    image_format = Image.registered_extensions().get(output_path.suffix.lower())
+    buffer = io.BytesIO()
+    if image_format != "PNG":
+        img.save(buffer, format=image_format)
+        return buffer.getvalue()
+
+    save_args = {"compress_level": options["compress_level"], "optimize": options["optimize"]}
+    if options["quantize"] and max(img.size) <= options["quantize_max_size"]:
+        if (converted := to_palette(img)) is not None:
+            img, save_args["transparency"] = converted
+    img.save(buffer, format="PNG", **save_args)
+    return buffer.getvalue()
@@ -1,8 +1,18 @@
+import glob
+import hashlib
 import json
-from reticulator import Project
+import os
+from collections.abc import Callable
+from functools import cache
+from pathlib import Path
+from reticulator import ItemFileBP, Project, RecipeFile
 
 # -------------------------------------------------------------------------------------- #
 TEXTURE_MAP_PATH = "data/image_mixer/texture_map.json"
+RECIPE_CACHE_PATH = Path("data/image_mixer/recipe_cache.json")
+
+# Bump when the cached values change shape, so older caches are ignored.
+RECIPE_CACHE_VERSION = 1
 
 with open(TEXTURE_MAP_PATH, "r", encoding="utf-8") as f:
     TEXTURE_MAP: dict[str, str] = json.load(f)
@@ -18,6 +28,150 @@ class TextureResolutionError(Exception):
     """Raised when a named recipe item cannot be found in the texture map or behavior pack."""
 
 
+# -------------------------------------------------------------------------------------- #
+# Persistent parse cache
+#
+# Parsing every recipe and item file through reticulator is the slow part of startup.
+# What each file contributes (a recipe's data, an item's icon shortname, the
+# item_texture.json index) is stored in RECIPE_CACHE_PATH, keyed by the file's path
+# and validated by mtime and size, falling back to a content hash when those differ
+# (Regolith copies the packs into a fresh working directory on every run). Textures are
+# still resolved from these values on every run, so editing an item, item_texture.json
+# or texture_map.json can never leave a stale path behind.
+# -------------------------------------------------------------------------------------- #
+
+_recipe_cache: dict[str, dict] | None = None
+_recipe_cache_dirty = False
+_recipe_cache_read_only = False
+
+
+def _load_recipe_cache() -> dict[str, dict]:
+    global _recipe_cache
+    if _recipe_cache is None:
+        try:
+            with RECIPE_CACHE_PATH.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        files = data.get("files", {}) if data.get("version") == RECIPE_CACHE_VERSION else {}
+        _recipe_cache = files
+    return _recipe_cache
+
+
+def set_read_only(read_only: bool = True) -> None:
+    """Keep save_recipe_cache from writing, e.g. for a dry run that must not touch the disk."""
+    global _recipe_cache_read_only
+    _recipe_cache_read_only = read_only
+
+
+def save_recipe_cache() -> None:
+    """Write the parse cache if anything changed, dropping entries for deleted files."""
+    global _recipe_cache_dirty
+    if not _recipe_cache_dirty or _recipe_cache_read_only:
+        return
+    files = {key: entry for key, entry in _load_recipe_cache().items() if Path(key).is_file()}
+    RECIPE_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    with RECIPE_CACHE_PATH.open("w", encoding="utf-8") as f:
+        json.dump({"version": RECIPE_CACHE_VERSION, "files": dict(sorted(files.items()))}, f)
+    _recipe_cache_dirty = False
+
+
+def _cached_parse(path: Path, parse: Callable[[], object]) -> object:
+    """
+    Return parse()'s value for the file at path, from the cache if the file is unchanged.
+
+    Missing files are never cached, so parse() raises the same errors it always has.
+    """
+    global _recipe_cache_dirty
+    if not path.is_file():
+        return parse()
+
+    files = _load_recipe_cache()
+    key = path.as_posix()
+    stat = path.stat()
+    entry = files.get(key)
+    if entry and entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+        return entry["value"]
+
+    digest = hashlib.sha256(path.read_bytes()).hexdigest()
+    if entry and entry["sha256"] == digest:
+        value = entry["value"]
+    else:
+        # Round-trip through JSON so a fresh parse looks exactly like a cached one.
+        value = json.loads(json.dumps(parse()))
+    files[key] = {
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "sha256": digest,
+        "value": value,
+    }
+    _recipe_cache_dirty = True
+    return value
+
+
+def _pack_files(pack, folder: str) -> list[str]:
+    """List a pack folder's JSON files relative to the pack, in the order reticulator uses."""
+    base_directory = os.path.join(pack.input_path, folder)
+    return [
+        os.path.relpath(path, pack.input_path)
+        for path in glob.glob(base_directory + "/**/*.json", recursive=True)
+    ]
+
+
+# -------------------------------------------------------------------------------------- #
+
+
+def _parse_item_icon(local_path: str) -> tuple[str | None, str | None]:
+    """Return an item file's identifier and icon shortname (None if it has no usable icon)."""
+    item = ItemFileBP(filepath=local_path, pack=BP)
+    identifier = item.get_jsonpath("minecraft:item/description/identifier", default=None)
+    icon = item.get_jsonpath("**/minecraft:icon", default=None)
+    if isinstance(icon, str):
+        return identifier, icon
+    if isinstance(icon, dict):
+        return identifier, icon.get("textures", {}).get("default")
+    return identifier, None
+
+
+@cache
+def _item_icon_index() -> dict[str, str | None]:
+    """
+    Map every BP item identifier to its icon shortname, in a single pass over the items.
+
+    Items without a usable icon map to None. If two files declare the same
+    identifier the first one wins, as with BP.get_item.
+    """
+    index: dict[str, str | None] = {}
+    for local_path in _pack_files(BP, "items"):
+        identifier, shortname = _cached_parse(
+            Path(BP.input_path, local_path), lambda: _parse_item_icon(local_path)
+        )
+        if identifier and identifier not in index:
+            index[identifier] = shortname
+    return index
+
+
+def _parse_item_textures() -> dict[str, str]:
+    index: dict[str, str] = {}
+    texture_data = RP.item_texture_file.get_jsonpath("texture_data", default={})
+    for shortname, entry in texture_data.items():
+        textures = entry.get("textures") if isinstance(entry, dict) else None
+        if not textures:
+            continue
+        path = textures[0].get("path") if isinstance(textures, list) else textures
+        index[shortname] = f"RP/{path}.png"
+    return index
+
+
+@cache
+def _item_texture_index() -> dict[str, str]:
+    """Map every shortname in RP/textures/item_texture.json to its texture file path."""
+    return _cached_parse(
+        Path(RP.input_path, "textures/item_texture.json"), _parse_item_textures
+    )
+
+
+@cache
 def get_item_texture_path(item_name: str | None) -> str | None:
     """
     Convert an item identifier like 'tsu_nat:void_crystal' to its texture path.
@@ -25,8 +179,11 @@ def get_item_texture_path(item_name: str | None) -> str | None:
     Resolution order:
       1. Empty slot (item_name is None/blank) → return None
       2. Manual override in texture_map.json → return that path
-      3. Reticulator BP scan → resolve icon shortname → return RP texture path
-      4. Not found by reticulator → raise TextureResolutionError
+      3. BP item index → resolve icon shortname → return RP texture path
+      4. Not in the BP item index → raise TextureResolutionError
+
+    The BP items and item_texture.json are indexed once, on first use, and
+    results are memoized, so each lookup is a dictionary hit.
     """
     if not item_name:
         return None
@@ -34,32 +191,17 @@ def get_item_texture_path(item_name: str | None) -> str | None:
     if path_override := TEXTURE_MAP.get(item_name):
         return path_override
 
-    item = BP.get_item(item_name)
-    if not item:
+    icons = _item_icon_index()
+    if item_name not in icons:
         raise TextureResolutionError(
             f"Item '{item_name}' was not found in the behavior pack and has no entry in "
             f"'{TEXTURE_MAP_PATH}'. Add a manual texture path override there to fix this."
         )
 
-    icon = item.get_jsonpath("**/minecraft:icon", default=None)
-    if isinstance(icon, str):
-        shortname = icon
-    elif isinstance(icon, dict):
-        shortname = icon.get("textures", {}).get("default")
-    else:
-        return None
-
+    shortname = icons[item_name]
     if not shortname:
         return None
-
-    texture_data = RP.item_texture_file.get_jsonpath(
-        f"texture_data/{shortname}/textures", default=None
-    )
-    if not texture_data:
-        return None
-
-    path = texture_data[0].get("path") if isinstance(texture_data, list) else texture_data
-    return f"RP/{path}.png"
+    return _item_texture_index().get(shortname)
 
 
 def get_tag_texture_path(tag_name: str) -> str | None:
@@ -242,6 +384,46 @@ def _append_slots(store: dict, slot_textures: dict, num_slots: int) -> None:
         store["result"].append(slot_textures.get("result"))
 
 
+# Maps recipe type key -> (store key, handler, num_slots)
+RECIPE_HANDLERS = {
+    "minecraft:recipe_shaped":    ("shaped",    get_shaped_slot_textures,    9),
+    "minecraft:recipe_shapeless": ("shapeless", get_shapeless_slot_textures, 9),
+    "minecraft:recipe_furnace":   ("furnace",   get_furnace_slot_textures,   2),
+}
+
+
+def _parse_recipe(local_path: str) -> tuple[str, dict] | None:
+    """Return a recipe file's supported recipe type and its data, or None."""
+    recipe = RecipeFile(filepath=local_path, pack=BP)
+    for recipe_type in RECIPE_HANDLERS:
+        if recipe_data := recipe.data.get(recipe_type):
+            return recipe_type, recipe_data
+    return None
+
+
+@cache
+def get_recipe_index() -> tuple[tuple[str, dict, int], ...]:
+    """
+    Resolve the slot textures of every recipe in the behavior pack, once per process.
+
+    Returns one (store key, slot textures, num_slots) entry per supported recipe,
+    in BP.recipes order. Every mixer filters this same index by its own whitelists,
+    so the pack is only walked and its textures only resolved the first time.
+    Recipe and item files unchanged since the last run are not re-parsed (see
+    RECIPE_CACHE_PATH). A TextureResolutionError is not cached and is raised
+    again on the next call.
+    """
+    index = []
+    for local_path in _pack_files(BP, "recipes"):
+        parsed = _cached_parse(Path(BP.input_path, local_path), lambda: _parse_recipe(local_path))
+        if parsed:
+            recipe_type, recipe_data = parsed
+            store_key, handler, num_slots = RECIPE_HANDLERS[recipe_type]
+            index.append((store_key, handler(recipe_data), num_slots))
+    save_recipe_cache()
+    return tuple(index)
+
+
 def get_flattened_recipe_data(
     id_whitelist: list[str] | None = None,
     tag_whitelist: list[str] | None = None,
@@ -268,19 +450,8 @@ def get_flattened_recipe_data(
         "furnace":   {"ids": [], "slots": [[] for _ in range(2)]},
     }
 
-    # Maps recipe type key -> (store key, handler, num_slots)
-    recipe_handlers = {
-        "minecraft:recipe_shaped":    ("shaped",    get_shaped_slot_textures,    9),
-        "minecraft:recipe_shapeless": ("shapeless", get_shapeless_slot_textures, 9),
-        "minecraft:recipe_furnace":   ("furnace",   get_furnace_slot_textures,   2),
-    }
-
-    for recipe in BP.recipes:
-        for recipe_type, (store_key, handler, num_slots) in recipe_handlers.items():
-            if recipe_data := recipe.data.get(recipe_type):
-                slot_textures = handler(recipe_data)
-                if _passes_whitelist(slot_textures, id_whitelist, tag_whitelist):
-                    _append_slots(final[store_key], slot_textures, num_slots)
-                break
+    for store_key, slot_textures, num_slots in get_recipe_index():
+        if _passes_whitelist(slot_textures, id_whitelist, tag_whitelist):
+            _append_slots(final[store_key], slot_textures, num_slots)
 
     return final
\ No newline at end of file
@@ -1,46 +1,79 @@
+import hashlib
+
 import numpy as np
 from PIL import Image
 
 # Maps R channel value to slot index (0-based).
 # Values are spaced 10 apart so a tolerance of ±4 can match each value
 # unambiguously even with minor compression artifacts.
-SLOT_R_VALUES: dict[int, int] = {
-    10:  0,   # slot 0  (shaped: top-left,  furnace: input)
-    20:  1,   # slot 1  (shaped: top-mid,   furnace: output)
-    30:  2,   # slot 2
-    40:  3,   # slot 3
-    50:  4,   # slot 4
-    60:  5,   # slot 5
-    70:  6,   # slot 6
-    80:  7,   # slot 7
-    90:  8,   # slot 8
-    100: 9,   # slot 9  (result)
-}
+#   10 → slot 0  (shaped: top-left,  furnace: input)
+#   20 → slot 1  (shaped: top-mid,   furnace: output)
+#   ...
+#  100 → slot 9  (shaped: result)
+#  110 … 250 → slots 10-24, for layouts with more than 10 slots
+SLOT_R_VALUES: dict[int, int] = {10 * (slot + 1): slot for slot in range(25)}
+
+# Slots that are expected in every template unless the caller says otherwise.
+DEFAULT_SLOT_COUNT = 10
 
 _TOLERANCE = 4  # Max deviation from an R value to still count as a match
 
+# Every 8-bit value mapped to the slot it encodes, or -1.
+_SLOT_LOOKUP = np.full(256, -1, dtype=np.int16)
+for _r_value, _slot_index in SLOT_R_VALUES.items():
+    _SLOT_LOOKUP[max(_r_value - _TOLERANCE, 0) : _r_value + _TOLERANCE + 1] = _slot_index
+
+# Parsed templates keyed by the SHA-256 of the file, so mixers sharing a template
+# (or identical copies of one) only parse it once per process.
+_parsed: dict[str, dict[int, tuple[int, int, int, int]]] = {}
 
-def _find_bbox_in_channel(channel: np.ndarray, r_value: int) -> tuple[int, int, int, int] | None:
+
+def _channel_bboxes(channel: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
     """
-    Find the bounding box of all pixels within tolerance of r_value in a single channel.
+    Label every pixel of a channel with its slot and measure each slot in one pass.
 
     Args:
         channel: 2D numpy array of uint8 pixel values.
-        r_value: Target R value to search for.
 
     Returns:
-        (x_min, y_min, x_max, y_max) or None if fewer than 2 pixels match.
+        (counts, bboxes): per-slot matching pixel counts, and an array of
+        (x_min, y_min, x_max, y_max) rows indexed by slot. Rows for slots
+        with no matching pixels are meaningless.
     """
-    mask = np.abs(channel.astype(int) - r_value) <= _TOLERANCE
-    ys, xs = np.where(mask)
-
-    if len(xs) < 2:
-        return None
+    slot_count = len(SLOT_R_VALUES)
+    labels = _SLOT_LOOKUP[channel].ravel()
+    matches = np.flatnonzero(labels >= 0)
+    slots = labels[matches]
+    ys, xs = np.divmod(matches, channel.shape[1])
+
+    counts = np.bincount(slots, minlength=slot_count)
+    bboxes = np.empty((slot_count, 4), dtype=np.int64)
+    bboxes[:, :2] = np.iinfo(np.int64).max
+    bboxes[:, 2:] = -1
+    np.minimum.at(bboxes[:, 0], slots, xs)
+    np.minimum.at(bboxes[:, 1], slots, ys)
+    np.maximum.at(bboxes[:, 2], slots, xs)
+    np.maximum.at(bboxes[:, 3], slots, ys)
+    return counts, bboxes
+
+
+def _parse_slot_template(arr: np.ndarray) -> dict[int, tuple[int, int, int, int]]:
+    """Return the bbox of every slot present in an RGB template array."""
+    per_channel = [_channel_bboxes(arr[:, :, c]) for c in range(3)]
 
-    return int(xs.min()), int(ys.min()), int(xs.max()), int(ys.max())
+    slots: dict[int, tuple[int, int, int, int]] = {}
+    for slot_index in SLOT_R_VALUES.values():
+        # The first channel (R, G, B) with at least 2 matching pixels wins.
+        for counts, bboxes in per_channel:
+            if counts[slot_index] >= 2:
+                slots[slot_index] = tuple(int(v) for v in bboxes[slot_index])
+                break
+    return slots
 
 
-def read_slot_template(template_path: str) -> dict[int, tuple[int, int, int, int]]:
+def read_slot_template(
+    template_path: str, slot_count: int | None = None
+) -> dict[int, tuple[int, int, int, int]]:
     """
     Parse a slot template PNG and return a dict mapping slot index to bounding box.
 
@@ -50,47 +83,44 @@ def read_slot_template(template_path: str) -> dict[int, tuple[int, int, int, int
 
     Encoding rules:
       - Image is treated as RGB (alpha is ignored)
-      - R values 10, 20, 30 ... 100 map to slot indices 0-9
+      - R values 10, 20, 30 ... 250 map to slot indices 0-24
       - For each slot, channels R, G, B are checked in order — the first channel
         with at least 2 matching pixels wins. This allows up to 3 slots to share
         a pixel without ambiguity on their corner markers.
       - Bounding box = min/max x and y of all matching pixels in the winning channel.
         Fill the entire slot rectangle if desired — only the extremes matter.
-      - A slot missing from all channels produces a warning and is omitted.
+      - A slot below slot_count (default 10) that is missing from all channels
+        produces a warning and is omitted.
+
+    Every pixel is labelled with its slot once per channel, and the result is
+    cached by the file's SHA-256 for the rest of the process.
 
     Returns:
         dict mapping slot_index to (x_min, y_min, x_max, y_max)
     """
-    img = Image.open(template_path).convert("RGB")
-    arr = np.array(img)  # shape: (height, width, 3)
+    with open(template_path, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
 
-    channels = {
-        "R": arr[:, :, 0],
-        "G": arr[:, :, 1],
-        "B": arr[:, :, 2],
-    }
+    slots = _parsed.get(digest)
+    if slots is None:
+        img = Image.open(template_path).convert("RGB")
+        slots = _parse_slot_template(np.array(img))  # shape: (height, width, 3)
+        _parsed[digest] = slots
 
-    slots: dict[int, tuple[int, int, int, int]] = {}
-
-    for r_value, slot_index in SLOT_R_VALUES.items():
-        bbox = None
-        for channel_name, channel in channels.items():
-            bbox = _find_bbox_in_channel(channel, r_value)
-            if bbox is not None:
-                break
-
-        if bbox is None:
+        r_values = {slot_index: r_value for r_value, slot_index in SLOT_R_VALUES.items()}
+        for slot_index, (x_min, y_min, x_max, y_max) in slots.items():
             print(
-                f"[WARNING] Slot template '{template_path}': "
-                f"slot {slot_index} (R={r_value}) not found in any channel — slot will be skipped."
-            )
-        else:
-            x_min, y_min, x_max, y_max = bbox
-            print(
-                f"[TEMPLATE] Slot {slot_index} (R={r_value}): "
+                f"[TEMPLATE] Slot {slot_index} (R={r_values[slot_index]}): "
                 f"bbox=({x_min},{y_min})->({x_max},{y_max}) "
                 f"size={x_max - x_min + 1}x{y_max - y_min + 1}"
             )
-            slots[slot_index] = bbox
 
-    return slots
+    for r_value, slot_index in SLOT_R_VALUES.items():
+        if slot_index < (DEFAULT_SLOT_COUNT if slot_count is None else slot_count):
+            if slot_index not in slots:
+                print(
+                    f"[WARNING] Slot template '{template_path}': "
+                    f"slot {slot_index} (R={r_value}) not found in any channel — slot will be skipped."
+                )
+
+    return dict(slots)
@@ -0,0 +1,410 @@
+import itertools
+import json
+from pathlib import Path
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import atlas
+import image_mixer
+import numpy_compositor
+import output_manifest
+import recipe_image_gen
+import slot_template
+
+# Run from test/packs, like the filter: python -m pytest ../../test.py
+MIXER_PATH = "data/image_mixer/mixers/furnace.json"
+SHAPED_TEMPLATE_PATH = "RP/textures/shaped_slots.png"
+
+# Plan mode must not write the recipe cache into the test project.
+recipe_image_gen.set_read_only()
+
+
+def write_png(path, size, colour):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    Image.new("RGBA", size, colour).save(path)
+    return path
+
+
+def random_png(path, size, seed, binary_alpha=False):
+    pixels = np.random.default_rng(seed).integers(0, 256, (size[1], size[0], 4), dtype=np.uint8)
+    if binary_alpha:
+        pixels[..., 3] = np.where(pixels[..., 3] < 128, 0, 255)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    Image.fromarray(pixels, "RGBA").save(path)
+    return path
+
+
+@pytest.fixture
+def manifest_path(monkeypatch, tmp_path):
+    path = tmp_path / "manifest.json"
+    monkeypatch.setattr(output_manifest, "MANIFEST_PATH", path)
+    return path
+
+
+def plan_for(executor, workers):
+    with open(MIXER_PATH, "r", encoding="utf-8") as f:
+        mixer = json.load(f)
+    mixer.update({"executor": executor, "workers": workers})
+    return image_mixer.generate_images(mixer, plan=True, plan_samples=2)
+
+
+def test_plan_thread_executor_not_divided_by_cores(monkeypatch):
+    monkeypatch.setattr(image_mixer.os, "cpu_count", lambda: 16)
+
+    plan = plan_for("thread", 8)
+    assert plan["parallelism"] == image_mixer.THREAD_PARALLELISM == 1
+    assert plan["projected_seconds"] == plan["seconds_per_image"] * plan["renders"]
+
+
+def test_plan_process_executor_divided_by_workers(monkeypatch):
+    monkeypatch.setattr(image_mixer.os, "cpu_count", lambda: 16)
+
+    plan = plan_for("process", 8)
+    assert plan["parallelism"] == 8
+    assert plan["projected_seconds"] == plan["seconds_per_image"] * plan["renders"] / 8
+
+
+def test_plan_process_executor_capped_at_core_count(monkeypatch):
+    monkeypatch.setattr(image_mixer.os, "cpu_count", lambda: 4)
+
+    assert plan_for("process", 32)["parallelism"] == 4
+
+
+def test_mixers_sharing_a_folder_skip_unchanged_outputs(manifest_path, tmp_path, capsys):
+    base = write_png(tmp_path / "in" / "base.png", (8, 8), (0, 0, 255, 255))
+    write_png(tmp_path / "in" / "items" / "red.png", (4, 4), (255, 0, 0, 255))
+    write_png(tmp_path / "in" / "items" / "green.png", (4, 4), (0, 255, 0, 128))
+    mixers = [
+        {
+            "output_folder": str(tmp_path / "out"),
+            "output_template": f"{name}_{{layer1}}.png",
+            "combination_mode": "cartesian",
+            "layers": [{"path": str(base)}, {"path": str(tmp_path / "in" / "items")}],
+        }
+        for name in ("a", "b")
+    ]
+    for mixer in mixers:
+        image_mixer.generate_images(mixer)
+    capsys.readouterr()
+
+    for mixer in mixers:
+        image_mixer.generate_images(mixer)
+    assert capsys.readouterr().out.count("Skipped 2 of 2 unchanged images.") == 2
+    assert len(json.loads(manifest_path.read_text())["mixers"]) == 2
+
+
+def test_streaming_pulls_combinations_lazily(monkeypatch, manifest_path, tmp_path):
+    base = write_png(tmp_path / "in" / "base.png", (8, 8), (0, 0, 255, 255))
+    for layer, count in (("a", 3), ("b", 4)):
+        for i in range(count):
+            write_png(tmp_path / "in" / layer / f"{i}.png", (2, 2), (40 * i, 0, 0, 255))
+
+    def no_list(*args):
+        raise AssertionError("streaming mode built the combination list")
+
+    monkeypatch.setattr(image_mixer, "cartesian_combinations", no_list)
+    monkeypatch.setattr(image_mixer, "generate_combinations", no_list)
+
+    pulled = 0
+    done = 0
+    queued = []
+    iter_combinations = image_mixer.iter_combinations
+    process_combination = image_mixer.process_combination
+
+    def counting_iter(*args):
+        nonlocal pulled
+        for combination in iter_combinations(*args):
+            pulled += 1
+            yield combination
+
+    def counting_process(*args):
+        nonlocal done
+        queued.append(pulled - done)
+        result = process_combination(*args)
+        done += 1
+        return result
+
+    monkeypatch.setattr(image_mixer, "iter_combinations", counting_iter)
+    monkeypatch.setattr(image_mixer, "process_combination", counting_process)
+    image_mixer.generate_images(
+        {
+            "output_folder": str(tmp_path / "out"),
+            "output_template": "{layer1}_{layer2}.png",
+            "layers": [
+                {"path": str(base)},
+                {"path": str(tmp_path / "in" / "a")},
+                {"path": str(tmp_path / "in" / "b")},
+            ],
+            "streaming": True,
+            "workers": 1,
+            "max_in_flight": 2,
+        }
+    )
+
+    assert done == 12 and len(list((tmp_path / "out").glob("*.png"))) == 12
+    # The window holds max_in_flight tasks, plus the one pulled while waiting for a slot.
+    assert max(queued) <= 2 + 1
+    # Streaming mode keeps no per-combination manifest.
+    assert not manifest_path.exists()
+
+
+def test_numpy_compositor_matches_pillow(manifest_path, tmp_path):
+    inputs = tmp_path / "in"
+    for i in range(2):
+        random_png(inputs / "soft" / f"soft{i}.png", (6, 6), 1 + i)
+    layers = [
+        {"path": str(random_png(inputs / "base.png", (16, 16), 0))},
+        # Partially transparent overlays, two variants so the prefix cache is used.
+        {"path": str(inputs / "soft")},
+        # Binary alpha, hanging off the top left corner.
+        {
+            "path": str(random_png(inputs / "hard.png", (6, 6), 3, binary_alpha=True)),
+            "anchor": "top_left",
+            "offset": [-3, -2],
+        },
+        # Scaled and clipped at the bottom right edge.
+        {
+            "path": str(random_png(inputs / "edge.png", (5, 7), 4)),
+            "anchor": "bottom_right",
+            "offset": [3, 4],
+            "scale": 2,
+        },
+        # Entirely outside the canvas.
+        {"path": str(random_png(inputs / "outside.png", (4, 4), 5)), "offset": [40, 0]},
+    ]
+    for compositor in image_mixer.COMPOSITORS:
+        image_mixer.generate_images(
+            {
+                "output_folder": str(tmp_path / compositor),
+                "output_template": "{layer1}.png",
+                "layers": [dict(layer) for layer in layers],
+                "compositor": compositor,
+            }
+        )
+
+    for name in ("soft0.png", "soft1.png"):
+        expected = np.asarray(Image.open(tmp_path / "pillow" / name))
+        actual = np.asarray(Image.open(tmp_path / "numpy" / name))
+        assert np.array_equal(expected, actual), name
+
+
+BACKDROP = (51, 102, 204, 255)  # (0.2, 0.4, 0.8)
+SOURCE = (153, 51, 255, 255)  # (0.6, 0.2, 1.0)
+
+
+def blend_pixel(backdrop, source, mode):
+    canvas = np.array([[backdrop]], dtype=np.uint8)
+    numpy_compositor.blend_region(canvas, np.array([[source]], dtype=np.uint8), (0, 0), mode)
+    return tuple(int(value) for value in canvas[0, 0])
+
+
+@pytest.mark.parametrize(
+    "mode, expected",
+    [
+        # b * s
+        ("multiply", (31, 20, 204, 255)),
+        # b + s - b * s
+        ("screen", (173, 133, 255, 255)),
+        # 2 * b * s where b <= 0.5, else 1 - 2 * (1 - b) * (1 - s)
+        ("overlay", (61, 41, 255, 255)),
+        # min(b + s, 1)
+        ("add", (204, 153, 255, 255)),
+        # luma(b) * s, luma(b) = 0.299 * 0.2 + 0.587 * 0.4 + 0.114 * 0.8 = 0.3858
+        ("tint", (59, 20, 98, 255)),
+    ],
+)
+def test_blend_modes_on_opaque_pixels(mode, expected):
+    assert blend_pixel(BACKDROP, SOURCE, mode) == expected
+
+
+def test_blend_mode_with_translucent_source():
+    # Half the source alpha mixes the multiplied colour with the backdrop:
+    # 128/255 * 0.12 + 127/255 * 0.2 = 0.1598 -> 41 and 128/255 * 0.08 + 127/255 * 0.4 = 0.2394 -> 61.
+    assert blend_pixel(BACKDROP, SOURCE[:3] + (128,), "multiply") == (41, 61, 204, 255)
+
+
+@pytest.mark.parametrize("mode", numpy_compositor.BLEND_MODES[1:])
+def test_blend_modes_at_alpha_extremes(mode):
+    # Over a transparent backdrop the source is composited as is, and a
+    # transparent source leaves the backdrop untouched.
+    assert blend_pixel((10, 20, 30, 0), SOURCE, mode) == SOURCE
+    assert blend_pixel(BACKDROP, SOURCE[:3] + (0,), mode) == BACKDROP
+
+
+def variants(name, count):
+    return [{"path": f"{name}{i}"} for i in range(count)]
+
+
+def test_combination_at_matches_itertools_product():
+    all_layers = [variants("a", 1), variants("b", 3), variants("c", 2), variants("d", 4)]
+    expected = list(itertools.product(*all_layers))
+
+    assert image_mixer.combination_count(all_layers, "cartesian") == len(expected) == 24
+    for i, combination in enumerate(expected):
+        assert image_mixer.combination_at(all_layers, "cartesian", i) == combination
+
+
+def test_combination_at_matches_zip_broadcast():
+    all_layers = [variants("a", 1), variants("b", 5), variants("c", 5)]
+    expected = image_mixer.zip_combinations(all_layers)
+
+    assert image_mixer.combination_count(all_layers, "zip") == len(expected) == 5
+    for i, combination in enumerate(expected):
+        assert image_mixer.combination_at(all_layers, "zip", i) == combination
+
+
+@pytest.mark.parametrize("total, count", [(24, 4), (25, 4), (7, 3), (3, 5), (1, 1)])
+def test_shards_cover_every_index_once(total, count):
+    covered = []
+    for k in range(1, count + 1):
+        shard = image_mixer.shard_range(total, (k, count))
+        # Shards are contiguous and differ in size by at most one.
+        assert len(shard) in (total // count, total // count + 1)
+        covered.extend(shard)
+    assert covered == list(range(total))
+
+
+def test_index_range_is_clamped_within_a_shard():
+    assert image_mixer.shard_range(25, (2, 4), (2, 100)) == range(8, 12)
+    assert image_mixer.shard_range(25, None, (20, 100)) == range(20, 25)
+    with pytest.raises(ValueError):
+        image_mixer.shard_range(25, (5, 4))
+
+
+def reference_slot_bboxes(path):
+    """The original parser: one tolerance mask per slot and channel."""
+    arr = np.array(Image.open(path).convert("RGB"))
+    slots = {}
+    for r_value, slot_index in slot_template.SLOT_R_VALUES.items():
+        for c in range(3):
+            ys, xs = np.where(np.abs(arr[:, :, c].astype(int) - r_value) <= 4)
+            if len(xs) >= 2:
+                slots[slot_index] = (int(xs.min()), int(ys.min()), int(xs.max()), int(ys.max()))
+                break
+    return slots
+
+
+def test_slot_template_matches_reference_parser():
+    slots = slot_template.read_slot_template(SHAPED_TEMPLATE_PATH)
+    assert len(slots) == 10
+    assert slots == reference_slot_bboxes(SHAPED_TEMPLATE_PATH)
+
+
+def test_slot_template_with_more_than_ten_slots(tmp_path):
+    arr = np.zeros((40, 40, 3), dtype=np.uint8)
+    for slot in range(14):
+        x, y = 2 + 9 * (slot % 4), 2 + 9 * (slot // 4)
+        # Off by up to the tolerance, like a lossy re-save.
+        arr[y : y + 6, x : x + 5, 0] = 10 * (slot + 1) + (slot % 3) - 1
+    # Slot 14 shares its top-left corner pixel with slot 0 through the G channel.
+    arr[2:5, 2:9, 1] = 150
+    path = tmp_path / "slots.png"
+    Image.fromarray(arr, "RGB").save(path)
+
+    slots = slot_template.read_slot_template(str(path), 15)
+    assert len(slots) == 15
+    assert slots[0] == (2, 2, 6, 7)
+    assert slots[13] == (11, 29, 15, 34)
+    assert slots[14] == (2, 2, 8, 4)
+    assert slots == reference_slot_bboxes(path)
+
+
+def test_slot_template_cache_is_keyed_by_contents(tmp_path):
+    copy = tmp_path / "copy.png"
+    copy.write_bytes(Path(SHAPED_TEMPLATE_PATH).read_bytes())
+    slot_template.read_slot_template(SHAPED_TEMPLATE_PATH)
+    parsed = len(slot_template._parsed)
+
+    # An identical copy is served from the cache...
+    assert slot_template.read_slot_template(str(copy)) == reference_slot_bboxes(copy)
+    assert len(slot_template._parsed) == parsed
+
+    # ...and a changed file is parsed again.
+    arr = np.array(Image.open(copy).convert("RGB"))
+    arr[0:2, 0:2, 0] = 250
+    Image.fromarray(arr, "RGB").save(copy)
+    assert slot_template.read_slot_template(str(copy))[24] == (0, 0, 1, 1)
+    assert len(slot_template._parsed) == parsed + 1
+
+
+@pytest.mark.parametrize("method", image_mixer.DEDUPE_METHODS)
+def test_dedupe_renders_identical_images_once(method, monkeypatch, manifest_path, tmp_path, capsys):
+    base = write_png(tmp_path / "in" / "base.png", (8, 8), (0, 0, 255, 255))
+    items = tmp_path / "in" / "items"
+    write_png(items / "a_red.png", (4, 4), (255, 0, 0, 255))
+    # Same bytes under another name, so the same image with another file name.
+    (items / "b_red_copy.png").write_bytes((items / "a_red.png").read_bytes())
+    write_png(items / "c_green.png", (4, 4), (0, 255, 0, 255))
+    mixer = {
+        "output_folder": str(tmp_path / "out"),
+        "output_template": "{layer1}.png",
+        "combination_mode": "zip",
+        "layers": [{"path": str(base)}, {"path": str(items)}],
+        "dedupe": method,
+    }
+
+    all_layers = image_mixer.expand_layers(mixer["layers"], {})
+    duplicates = image_mixer._find_duplicates(
+        all_layers, "zip", range(3), "{layer1}.png", tmp_path / "out", {}
+    )
+    assert {idx: paths[:2] for idx, paths in duplicates.items()} == {
+        1: (tmp_path / "out" / "b_red_copy.png", tmp_path / "out" / "a_red.png")
+    }
+
+    rendered = []
+    process_combination = image_mixer.process_combination
+
+    def recording_process(*args):
+        result = process_combination(*args)
+        rendered.append(result)
+        return result
+
+    monkeypatch.setattr(image_mixer, "process_combination", recording_process)
+    image_mixer.generate_images(mixer, profile=True)
+
+    first, second = tmp_path / "out" / "a_red.png", tmp_path / "out" / "b_red_copy.png"
+    assert sorted(Path(key).name for key, _, was_rendered in rendered if was_rendered) == [
+        "a_red.png",
+        "c_green.png",
+    ]
+    assert second.read_bytes() == first.read_bytes()
+    assert second.samefile(first) == (method == "hardlink")
+    linked, copied = (1, 0) if method == "hardlink" else (0, 1)
+    assert (
+        f"Deduplicated 1 of 3 images: {linked} hardlinked, {copied} copied, 0 unchanged."
+        in capsys.readouterr().out
+    )
+    report = json.loads((tmp_path / "out" / image_mixer.REPORT_FILENAME).read_text())
+    assert (report["rendered"], report["deduplicated"]) == (2, 1)
+
+
+def test_atlas_index_matches_page_pixels(tmp_path):
+    colours = [(40 * i, 255 - 30 * i, 7 * i, 255) for i in range(7)]
+    writer = atlas.AtlasWriter(tmp_path, "atlas", (3, 2), len(colours), max_size=8, padding=1)
+    # Tiles arrive out of order, like results from a pool.
+    for position in (4, 0, 6, 2, 5, 1, 3):
+        writer.add(position, f"tile{position}", Image.new("RGBA", (3, 2), colours[position]))
+    index = json.loads(writer.close().read_text())
+
+    assert writer.page_count == 2
+    for page in index["pages"]:
+        assert Image.open(tmp_path / page["file"]).size == tuple(page["size"])
+        assert max(page["size"]) <= 8
+    for position, colour in enumerate(colours):
+        entry = index["tiles"][f"tile{position}"]
+        page = index["pages"][entry["page"]]
+        x, y, w, h = entry["rect"]
+        image = Image.open(tmp_path / page["file"]).convert("RGBA")
+        assert (np.asarray(image.crop((x, y, x + w, y + h))) == colour).all()
+        page_w, page_h = page["size"]
+        assert entry["uv"] == [x / page_w, y / page_h, (x + w) / page_w, (y + h) / page_h]
+    # Padding between tiles stays transparent.
+    first_page = Image.open(tmp_path / index["pages"][0]["file"]).convert("RGBA")
+    assert first_page.getpixel((3, 0)) == (0, 0, 0, 0)
+
+
+def test_atlas_rejects_tiles_larger_than_a_page(tmp_path):
+    with pytest.raises(ValueError, match="max_size"):
+        atlas.AtlasWriter(tmp_path, "atlas", (32, 16), 4, max_size=24)
@@ -1,4 +1,5 @@
 from pathlib import Path
+from functools import cache
 import json
 from PIL import Image
 from reticulator import *
@@ -20,6 +21,44 @@ with open(VANILLA_MAPPINGS_PATH, "r", encoding="utf-8") as f:
 
 
 # -------------------------------------------------------------------------------------- #
+@cache
+def get_item_icon_index():
+    """Maps every BP item identifier to its icon shortname, in one pass over the items."""
+    index = {}
+    for item in bp.items:
+        identifier = item.get_jsonpath(
+            "minecraft:item/description/identifier", default=None
+        )
+        if not identifier or identifier in index:
+            continue
+
+        icon = item.get_jsonpath("**/minecraft:icon", default=None)
+        if isinstance(icon, str):
+            index[identifier] = icon
+        elif isinstance(icon, dict):
+            index[identifier] = icon.get("textures", {}).get("default", None)
+        else:
+            index[identifier] = None
+    return index
+
+
+@cache
+def get_item_texture_index():
+    """Maps every shortname in item_texture.json to its texture path."""
+    index = {}
+    texture_data = rp.item_texture_file.get_jsonpath("texture_data", default={})
+    for shortname, entry in texture_data.items():
+        textures = entry.get("textures") if isinstance(entry, dict) else None
+        if not textures:
+            continue
+        if isinstance(textures, list):
+            index[shortname] = "RP/" + textures[0].get("path") + ".png"
+        else:
+            index[shortname] = "RP/" + textures + ".png"
+    return index
+
+
+@cache
 def get_item_texture_path(item_name):
     """Converts an item name like tsu_nat:void_crystal to a texture path."""
     if not item_name:
@@ -30,27 +69,10 @@ def get_item_texture_path(item_name):
     if path_from_vanilla:
         return path_from_vanilla
 
-    item = bp.get_item(item_name)
-    if not item:
-        return None
-
-    icon = item.get_jsonpath("**/minecraft:icon", default=None)
-    if isinstance(icon, str):
-        shortname = icon
-    elif isinstance(icon, dict):
-        shortname = icon.get("textures", {}).get("default", None)
-    else:
-        return None
-
-    texture_data = rp.item_texture_file.get_jsonpath(
-        f"texture_data/{shortname}/textures", default=None
-    )
-    if not texture_data:
+    shortname = get_item_icon_index().get(item_name)
+    if not shortname:
         return None
-    if isinstance(texture_data, list) and texture_data:
-        return "RP/" + texture_data[0].get("path") + ".png"
-    else:
-        return "RP/" + texture_data + ".png"
+    return get_item_texture_index().get(shortname)
 
 
 def flatten_pattern(pattern, key):